@@ -0,0 +1,387 @@
+"""
+Reproducible load benchmark for the Flask API.
+
+    cd backend
+    # 1. seed a database (SQLite file or any DB_URI SQLAlchemy understands)
+    python benchmarks/bench_api.py seed --db sqlite:////tmp/blog-bench.db --posts 100000 --comments 1000000
+    # 2. drive it in-process through the WSGI test client ...
+    python benchmarks/bench_api.py run --db sqlite:////tmp/blog-bench.db --mode wsgi --out before.json
+    #    ... or through real gunicorn workers over HTTP
+    python benchmarks/bench_api.py run --db sqlite:////tmp/blog-bench.db --mode gunicorn --workers 4 --out before.json
+    # 3. diff two runs (e.g. before/after a commit)
+    python benchmarks/bench_api.py compare before.json after.json
+
+Results are JSON. For each endpoint they hold p50/p95/p99 latency,
+requests/sec, status counts and, in wsgi mode, SQL queries per request.
+Gunicorn workers are separate processes, so their queries are not
+counted here. Use /api/_metrics for those.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PASSWORD = "benchmark-password"
+LOREM = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+         "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. ")
+
+
+def load_app(db_uri: str):
+    """Import main.py against db_uri (main reads its settings from the environment at import)."""
+    os.environ["DB_URI"] = db_uri
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+    # the login/add_comment scenarios would otherwise measure 429s; inherited by gunicorn too
+    os.environ.setdefault("RATE_LIMIT_URL", "none")
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import main
+    return main
+
+
+# -----------------------------
+# Seeding
+# -----------------------------
+def seed(args):
+    main = load_app(args.db)
+    db = main.db
+    rnd = random.Random(args.seed)
+    with main.app.app_context():
+        if db.session.execute(db.select(main.BlogPost.id).limit(1)).first() is not None:
+            sys.exit("Database already has posts; seed into an empty database.")
+        pw_hash = main.hasher.hash(PASSWORD)  # one hash shared by every user
+
+        def bulk(model, total, make_row, label):
+            t0 = time.perf_counter()
+            for start in range(1, total + 1, args.batch):
+                rows = [make_row(i) for i in range(start, min(start + args.batch, total + 1))]
+                db.session.execute(db.insert(model), rows)
+                db.session.commit()
+            took = time.perf_counter() - t0
+            print(f"{label}: {total} rows in {took:.1f}s ({total / took if took else 0:.0f} rows/s)", file=sys.stderr)
+
+        today = date.today().strftime("%B %d, %Y")
+        bulk(main.User, args.users, lambda i: {
+            "id": i, "email": f"user{i}@bench.local", "name": f"User {i}", "password": pw_hash,
+        }, "users")
+        bulk(main.BlogPost, args.posts, lambda i: {
+            "id": i, "author_id": rnd.randint(1, args.users), "title": f"Benchmark post {i}",
+            "subtitle": f"Subtitle {i}", "date": today, "img_url": "https://example.com/img.jpg",
+            "body": "<p>" + LOREM * rnd.randint(4, 16) + "</p>", "pinned": i % 500 == 0, "version": 1,
+        }, "posts")
+        # a tenth of all comments land on post 1 so the detail benchmark has a hot thread
+        hot = max(1, args.comments // 10)
+        bulk(main.Comment, args.comments, lambda i: {
+            "id": i, "author_id": rnd.randint(1, args.users),
+            "post_id": 1 if i <= hot else rnd.randint(1, args.posts),
+            "text": LOREM[: rnd.randint(20, 200)],
+        }, "comments")
+        if db.engine.dialect.name == "postgresql":
+            # rows went in with explicit ids; move the serial sequences past them so the
+            # write scenarios (add_comment, register) don't hit duplicate keys
+            for table in ("users", "blog_posts", "comments"):
+                db.session.execute(db.text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                ))
+            db.session.commit()
+
+        t0 = time.perf_counter()
+        main.rebuild_feed()
+        print(f"feed projection rebuilt in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        if args.search:
+            t0 = time.perf_counter()
+            n = main.search.rebuild(db.session, main.BlogPost, main.Comment)
+            print(f"search index: {n} documents in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+
+# -----------------------------
+# Drivers
+# -----------------------------
+class WSGIClient:
+    """One Flask test client per benchmark thread."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, body: dict | None = None) -> int:
+        resp = self.client.open(path, method=method, json=body)
+        resp.get_data()
+        return resp.status_code
+
+
+class HTTPClient:
+    """Cookie-keeping urllib client that does the SPA's csrf-token handshake."""
+
+    def __init__(self, base: str):
+        self.base = base
+        self.jar = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.jar))
+        self.request("GET", "/api/csrf-token")
+
+    def _csrf(self) -> str | None:
+        return next((c.value for c in self.jar if c.name == "csrf_token"), None)
+
+    def request(self, method: str, path: str, body: dict | None = None) -> int:
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        token = self._csrf()
+        if token:
+            req.add_header("X-CSRFToken", token)
+        try:
+            with self.opener.open(req, timeout=30) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+        except (ConnectionError, urllib.error.URLError):
+            return 0  # reported under status "0"
+
+
+def start_gunicorn(args, env: dict) -> tuple[subprocess.Popen, str]:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    cmd = ["gunicorn", "main:app", "-b", f"127.0.0.1:{port}",
+           "-w", str(args.workers), "--threads", str(args.threads), "--log-level", "warning"]
+    if args.gunicorn_config:
+        cmd += ["-c", args.gunicorn_config]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            if proc.poll() is not None:
+                sys.exit("gunicorn exited during startup")
+            time.sleep(0.2)
+    proc.terminate()
+    sys.exit("gunicorn did not start listening within 60s")
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def scenarios(max_post: int, user_count: int):
+    def login_body(rnd):
+        return {"email": f"user{rnd.randint(1, user_count)}@bench.local", "password": PASSWORD}
+
+    # name, method, path(rnd), body(rnd) or None, needs a logged-in client
+    return [
+        ("feed", "GET", lambda rnd: "/api/posts?limit=20", None, False),
+        ("feed_page", "GET", lambda rnd: f"/api/posts?limit=20&cursor=0:{rnd.randint(21, max_post)}", None, False),
+        ("post_detail", "GET", lambda rnd: f"/api/posts/{rnd.randint(1, max_post)}?comments_limit=50", None, False),
+        ("post_detail_hot", "GET", lambda rnd: "/api/posts/1?comments_limit=50", None, False),
+        ("login", "POST", lambda rnd: "/api/login", login_body, False),
+        ("add_comment", "POST", lambda rnd: f"/api/posts/{rnd.randint(1, max_post)}/comments",
+         lambda rnd: {"text": "benchmark comment"}, True),
+        ("index_html", "GET", lambda rnd: "/", None, False),
+    ]
+
+
+def percentile(sorted_values: list[float], pct: float) -> float | None:
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def run_scenario(make_client, scenario, requests: int, concurrency: int, seed: int, login, query_counter):
+    name, method, path_fn, body_fn, needs_login = scenario
+    per_thread = max(1, requests // concurrency)
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    lock = threading.Lock()
+
+    clients = []
+    for t in range(concurrency):
+        client = make_client()
+        if needs_login:
+            login(client, random.Random(seed + t))
+        clients.append(client)
+
+    def worker(t: int):
+        rnd = random.Random(seed * 1000 + t)
+        client = clients[t]
+        local_lat, local_status = [], {}
+        for _ in range(per_thread):
+            path = path_fn(rnd)
+            body = body_fn(rnd) if body_fn else None
+            t0 = time.perf_counter()
+            status = client.request(method, path, body)
+            local_lat.append(time.perf_counter() - t0)
+            local_status[status] = local_status.get(status, 0) + 1
+        with lock:
+            latencies.extend(local_lat)
+            for k, v in local_status.items():
+                statuses[k] = statuses.get(k, 0) + v
+
+    q0 = query_counter() if query_counter else None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    total = len(latencies)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    return {
+        "requests": total,
+        "errors": sum(v for k, v in statuses.items() if k >= 500),
+        "status_counts": {str(k): v for k, v in sorted(statuses.items())},
+        "rps": round(total / elapsed, 2) if elapsed else None,
+        "mean_ms": ms(sum(latencies) / total) if total else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "queries_per_request": round((query_counter() - q0) / total, 2) if query_counter and total else None,
+    }
+
+
+def run(args):
+    main = load_app(args.db)
+    with main.app.app_context():
+        max_post = main.db.session.execute(main.db.select(main.db.func.max(main.BlogPost.id))).scalar() or 0
+        user_count = main.db.session.execute(main.db.select(main.db.func.count(main.User.id))).scalar() or 0
+    if not max_post or not user_count:
+        sys.exit("Seed the database first (bench_api.py seed ...).")
+
+    def login(client, rnd):
+        client.request("POST", "/api/login", {"email": f"user{rnd.randint(1, user_count)}@bench.local",
+                                              "password": PASSWORD})
+
+    proc = None
+    query_counter = None
+    if args.mode == "wsgi":
+        from sqlalchemy import event
+        main.app.config["WTF_CSRF_ENABLED"] = False
+        count = [0]
+        count_lock = threading.Lock()
+
+        def on_query(*_):
+            with count_lock:
+                count[0] += 1
+        with main.app.app_context():
+            event.listen(main.db.engine, "before_cursor_execute", on_query)
+        query_counter = lambda: count[0]  # noqa: E731
+        make_client = lambda: WSGIClient(main.app)  # noqa: E731
+    else:
+        env = dict(os.environ)
+        proc, base = start_gunicorn(args, env)
+        make_client = lambda: HTTPClient(base)  # noqa: E731
+
+    only = set(args.only.split(",")) if args.only else None
+    results = {}
+    try:
+        for sc in scenarios(max_post, user_count):
+            if only and sc[0] not in only:
+                continue
+            if args.warmup:
+                run_scenario(make_client, sc, args.warmup, min(args.concurrency, args.warmup), args.seed, login, None)
+            results[sc[0]] = run_scenario(make_client, sc, args.requests, args.concurrency, args.seed, login,
+                                          query_counter)
+            print(f"{sc[0]:>16}: {results[sc[0]]['rps']} req/s  p95 {results[sc[0]]['p95_ms']} ms",
+                  file=sys.stderr)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": sys.version.split()[0],
+            "db": args.db.split("://", 1)[0],
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "gunicorn" else None,
+            "threads": args.threads if args.mode == "gunicorn" else None,
+            "concurrency": args.concurrency,
+            "requests_per_endpoint": args.requests,
+            "posts": max_post,
+            "users": user_count,
+        },
+        "endpoints": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"{'endpoint':>16} {'metric':>20} {'before':>10} {'after':>10} {'change':>8}")
+    for name, b in before["endpoints"].items():
+        a = after["endpoints"].get(name)
+        if not a:
+            continue
+        for metric in ("rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request"):
+            bv, av = b.get(metric), a.get(metric)
+            if bv is None or av is None:
+                continue
+            change = f"{(av - bv) / bv * 100:+.1f}%" if bv else "n/a"
+            print(f"{name:>16} {metric:>20} {bv:>10} {av:>10} {change:>8}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    s = sub.add_parser("seed", help="fill an empty database with synthetic users/posts/comments")
+    s.add_argument("--db", required=True, help="SQLAlchemy URI, e.g. sqlite:////tmp/blog-bench.db")
+    s.add_argument("--users", type=int, default=1000)
+    s.add_argument("--posts", type=int, default=10000)
+    s.add_argument("--comments", type=int, default=100000)
+    s.add_argument("--batch", type=int, default=5000, help="rows per INSERT transaction")
+    s.add_argument("--search", action="store_true", help="also build the full-text index")
+    s.add_argument("--seed", type=int, default=42)
+    s.set_defaults(func=seed)
+
+    r = sub.add_parser("run", help="benchmark the API endpoints")
+    r.add_argument("--db", required=True)
+    r.add_argument("--mode", choices=("wsgi", "gunicorn"), default="wsgi")
+    r.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    r.add_argument("--concurrency", type=int, default=8)
+    r.add_argument("--warmup", type=int, default=50)
+    r.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    r.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker")
+    r.add_argument("--gunicorn-config", help="pass -c <file> to gunicorn")
+    r.add_argument("--only", help="comma-separated scenario names")
+    r.add_argument("--out", help="also write the JSON report here")
+    r.add_argument("--seed", type=int, default=42)
+    r.set_defaults(func=run)
+
+    c = sub.add_parser("compare", help="diff two JSON reports")
+    c.add_argument("before")
+    c.add_argument("after")
+    c.set_defaults(func=compare)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
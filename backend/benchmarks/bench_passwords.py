@@ -0,0 +1,73 @@
+"""
+Password hashing micro-benchmark: logins/sec per hashing cost.
+
+    cd backend && python benchmarks/bench_passwords.py --costs 100000,260000,600000 --workers 2
+
+Each login is one verify on the PasswordHasher pool, driven by --clients
+concurrent callers. The output is JSON, so runs on different machines or
+commits can be diffed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from passwords import PasswordHasher, HasherBusy  # noqa: E402
+
+
+def bench_cost(iterations: int, workers: int, clients: int, seconds: float, processes: bool) -> dict:
+    hasher = PasswordHasher(method=f"pbkdf2:sha256:{iterations}", salt_length=16,
+                            workers=workers, max_pending=clients, use_processes=processes)
+    stored = hasher.hash("correct horse battery staple")
+    deadline = time.perf_counter() + seconds
+    latencies, rejected = [], 0
+
+    def client():
+        nonlocal rejected
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                hasher.verify(stored, "correct horse battery staple")
+            except HasherBusy:
+                rejected += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(client)
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "logins": len(latencies),
+        "rejected": rejected,
+        "logins_per_sec": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--costs", default="100000,260000,600000", help="comma-separated pbkdf2 iteration counts")
+    ap.add_argument("--workers", type=int, default=2, help="hashing pool size")
+    ap.add_argument("--clients", type=int, default=8, help="concurrent login callers")
+    ap.add_argument("--seconds", type=float, default=3.0, help="duration per cost")
+    ap.add_argument("--processes", action="store_true", help="use a process pool instead of threads")
+    args = ap.parse_args()
+
+    results = [bench_cost(int(c), args.workers, args.clients, args.seconds, args.processes)
+               for c in args.costs.split(",")]
+    print(json.dumps({"workers": args.workers, "clients": args.clients,
+                      "processes": args.processes, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+JSON serialization benchmark for the read API: bytes per response and
+time spent building/encoding it, on large feeds and a comment-heavy post.
+
+    cd backend
+    python benchmarks/bench_api.py seed --db sqlite:////tmp/blog-bench.db --posts 10000 --comments 100000
+    python benchmarks/bench_serialize.py --db sqlite:////tmp/blog-bench.db --out after.json
+    python benchmarks/bench_serialize.py --db sqlite:////tmp/blog-bench.db --compare before.json
+
+Runs in-process through the WSGI test client with the response cache off.
+"serialize_ms" is the serialize entry of the Server-Timing header:
+building the payload dicts plus encoding JSON. "total_ms" is the whole
+request.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_api import load_app  # noqa: E402
+
+
+def scenarios(busiest_post: int) -> dict[str, str]:
+    return {
+        "feed_all": "/api/posts",
+        "feed_page_100": "/api/posts?limit=100",
+        "feed_all_sparse": "/api/posts?fields=id,title",
+        "post_detail": f"/api/posts/{busiest_post}",
+        "post_detail_sparse": f"/api/posts/{busiest_post}?fields=id,title,comments&comment_fields=id,text",
+    }
+
+
+def server_timing(header: str, name: str) -> float | None:
+    for part in header.split(","):
+        bits = part.strip().split(";")
+        if bits[0] == name:
+            for b in bits[1:]:
+                if b.startswith("dur="):
+                    return float(b[4:])
+    return None
+
+
+def measure(client, path: str, repeat: int) -> dict:
+    totals, serialize, size, status = [], [], 0, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        resp = client.get(path)
+        totals.append((time.perf_counter() - t0) * 1000)
+        status = resp.status_code
+        size = len(resp.get_data())
+        s = server_timing(resp.headers.get("Server-Timing", ""), "serialize")
+        if s is not None:
+            serialize.append(s)
+    return {
+        "status": status,
+        "bytes": size,
+        "total_ms_p50": round(statistics.median(totals), 3),
+        "serialize_ms_p50": round(statistics.median(serialize), 3) if serialize else None,
+    }
+
+
+def run(args) -> dict:
+    os.environ["RESPONSE_CACHE_URL"] = "none"
+    os.environ["METRICS_SERVER_TIMING"] = "1"
+    os.environ.setdefault("JOB_WORKERS", "0")
+    os.environ.setdefault("EVENTS_URL", "memory")
+    main = load_app(args.db)
+    client = main.app.test_client()
+    with main.app.app_context():
+        busiest = main.db.session.execute(main.db.text(
+            "SELECT post_id FROM comments GROUP BY post_id ORDER BY COUNT(*) DESC LIMIT 1"
+        )).scalar() or 1
+    report = {}
+    for name, path in scenarios(busiest).items():
+        if args.only and name not in args.only.split(","):
+            continue
+        measure(client, path, 2)  # warm up
+        report[name] = {"path": path, **measure(client, path, args.repeat)}
+        print(f"{name:22} {report[name]}", file=sys.stderr)
+    return report
+
+
+def compare(before: dict, after: dict):
+    for name, a in after.items():
+        b = before.get(name)
+        if b is None:
+            print(f"{name:22} (new) {a['bytes']} B, serialize {a['serialize_ms_p50']} ms")
+            continue
+
+        def delta(key):
+            if not b.get(key) or a.get(key) is None:
+                return "n/a"
+            return f"{b[key]} -> {a[key]} ({(a[key] - b[key]) / b[key] * 100:+.1f}%)"
+
+        print(f"{name:22} bytes {delta('bytes')}; serialize ms {delta('serialize_ms_p50')}; "
+              f"total ms {delta('total_ms_p50')}")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--db", required=True, help="seeded database, see bench_api.py seed")
+    p.add_argument("--repeat", type=int, default=30)
+    p.add_argument("--only", help="comma-separated scenario names")
+    p.add_argument("--out", help="write the JSON report here")
+    p.add_argument("--compare", help="earlier report to diff against")
+    args = p.parse_args()
+    report = run(args)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
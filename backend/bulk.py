@@ -0,0 +1,252 @@
+import json
+import logging
+import time
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from sqlalchemy import bindparam, insert, select, update
+
+import search
+from content import render_body, sanitize_html
+
+log = logging.getLogger(__name__)
+
+
+# -----------------------------
+# NDJSON import / export
+# -----------------------------
+# One JSON object per line, tagged with "type": users, then posts, then
+# comments, so a reader can resolve every reference from rows it has
+# already seen:
+#   {"type": "user", "id": 1, "email": "...", "name": "...", "password": "pbkdf2:..."}
+#   {"type": "post", "id": 7, "author_id": 1, "title": "...", "subtitle": "...", "date": "...",
+#    "body": "...", "img_url": "...", "pinned": false}
+#   {"type": "comment", "id": 9, "post_id": 7, "author_id": 1, "text": "..."}
+# Export reads with server-side cursors (yield_per), and import writes with
+# batched executemany inserts, one transaction per batch, so memory stays
+# flat however big the file is. Import assigns fresh ids and remaps
+# references through the ids given in the file (only those id maps grow
+# with the input). Users match existing accounts by email. Posts match by
+# their unique title (skip or update), and comments are only attached to
+# posts this import created.
+
+EXPORT_BATCH = 1000
+IMPORT_BATCH = 1000
+MAX_REPORTED_ERRORS = 20
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def export_ndjson(session, user_model, post_model, comment_model, include_passwords: bool = False,
+                  batch_size: int = EXPORT_BATCH):
+    """Yield NDJSON lines for every user, post and comment, ordered by id."""
+    user_cols = [user_model.id, user_model.email, user_model.name]
+    if include_passwords:
+        user_cols.append(user_model.password)
+    queries = (
+        ("user", select(*user_cols).order_by(user_model.id)),
+        ("post", select(post_model.id, post_model.author_id, post_model.title, post_model.subtitle,
+                        post_model.date, post_model.body, post_model.img_url, post_model.pinned)
+         .order_by(post_model.id)),
+        ("comment", select(comment_model.id, comment_model.post_id, comment_model.author_id,
+                           comment_model.text).order_by(comment_model.id)),
+    )
+    started, rows = time.perf_counter(), 0
+    for kind, query in queries:
+        result = session.execute(query.execution_options(yield_per=batch_size))
+        for part in result.partitions():
+            yield "".join(
+                json.dumps({"type": kind, **row._mapping}, default=_json_default) + "\n" for row in part
+            )
+            rows += len(part)
+    elapsed = time.perf_counter() - started
+    log.info("exported %d rows in %.2fs (%.0f rows/s)", rows, elapsed, rows / elapsed if elapsed else 0)
+
+
+class _Importer:
+    def __init__(self, session, user_model, post_model, comment_model, on_conflict: str,
+                 default_author_id: int | None, batch_size: int):
+        if on_conflict not in ("skip", "update"):
+            raise ValueError("on_conflict must be 'skip' or 'update'")
+        self.session = session
+        self.users = user_model.__table__
+        self.posts = post_model.__table__
+        self.comments = comment_model.__table__
+        self.on_conflict = on_conflict
+        self.default_author_id = default_author_id
+        self.batch_size = batch_size
+        self.user_ids: dict[int, int] = {}
+        self.post_ids: dict[int, int] = {}  # only posts this import created
+        self.updated_posts: list[int] = []
+        self.stats = {"users": 0, "posts": 0, "comments": 0, "posts_updated": 0,
+                      "skipped": 0, "errors": 0, "error_samples": []}
+        self.pending_kind = None
+        self.pending: list[dict] = []
+
+    def error(self, lineno: int, message: str):
+        self.stats["errors"] += 1
+        if len(self.stats["error_samples"]) < MAX_REPORTED_ERRORS:
+            self.stats["error_samples"].append(f"line {lineno}: {message}")
+
+    def add(self, lineno: int, row: dict):
+        kind = row.get("type")
+        if kind not in ("user", "post", "comment"):
+            self.error(lineno, f"unknown type {kind!r}")
+            return
+        # later kinds reference earlier ones, so flush whenever the kind changes
+        if kind != self.pending_kind or len(self.pending) >= self.batch_size:
+            self.flush()
+            self.pending_kind = kind
+        row["_line"] = lineno
+        self.pending.append(row)
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        getattr(self, f"_flush_{self.pending_kind}s")(rows)
+        self.session.commit()
+
+    def _insert(self, table, rows: list[dict]) -> list[int]:
+        if not rows:
+            return []
+        stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        return list(self.session.execute(stmt, rows).scalars())
+
+    def _flush_users(self, rows: list[dict]):
+        valid = []
+        for r in rows:
+            if not r.get("email") or r.get("id") is None:
+                self.error(r["_line"], "user needs id and email")
+            else:
+                valid.append(r)
+        # email is unique: an existing account is reused, never overwritten
+        emails = {r["email"] for r in valid}
+        existing = dict(self.session.execute(
+            select(self.users.c.email, self.users.c.id).where(self.users.c.email.in_(emails))
+        ).all())
+        fresh, seen = [], set()
+        for r in valid:
+            if r["email"] in existing:
+                self.user_ids[r["id"]] = existing[r["email"]]
+                self.stats["skipped"] += 1
+            elif r["email"] not in seen:
+                seen.add(r["email"])
+                fresh.append(r)
+        new_ids = self._insert(self.users, [
+            # without an exported hash the account can't sign in until its password is reset
+            {"email": r["email"], "name": r.get("name") or "", "password": r.get("password") or "!"}
+            for r in fresh
+        ])
+        for r, new_id in zip(fresh, new_ids):
+            self.user_ids[r["id"]] = new_id
+        self.stats["users"] += len(new_ids)
+
+    def _post_values(self, r: dict) -> dict:
+        author = self.user_ids.get(r.get("author_id"), self.default_author_id)
+        return {
+            "title": r["title"], "subtitle": r["subtitle"], "body": r["body"], "img_url": r["img_url"],
+            "date": r.get("date") or date.today().strftime("%B %d, %Y"),
+            "pinned": bool(r.get("pinned")), "author_id": author,
+            **render_body(r["body"]),
+        }
+
+    def _flush_posts(self, rows: list[dict]):
+        by_title: dict[str, dict] = {}
+        aliases: dict[str, list[int]] = {}  # title -> file ids that resolve to it
+        for r in rows:
+            if r.get("id") is None or not all(r.get(k) for k in ("title", "subtitle", "body", "img_url")):
+                self.error(r["_line"], "post needs id, title, subtitle, body and img_url")
+                continue
+            aliases.setdefault(r["title"], []).append(r["id"])
+            if r["title"] in by_title:
+                # duplicate title inside the file: first wins for skip, last wins for update
+                self.stats["skipped"] += 1
+                if self.on_conflict == "skip":
+                    continue
+            by_title[r["title"]] = r
+        existing = dict(self.session.execute(
+            select(self.posts.c.title, self.posts.c.id).where(self.posts.c.title.in_(by_title))
+        ).all())
+        fresh, changed = [], []
+        for title, r in by_title.items():
+            if title not in existing:
+                fresh.append(r)
+                continue
+            if self.on_conflict == "update":
+                changed.append((existing[title], r))
+            else:
+                self.stats["skipped"] += 1
+        # rendered once: the same values feed the write and the search documents
+        changed = [(pid, self._post_values(r)) for pid, r in changed]
+        fresh_values = [self._post_values(r) for r in fresh]
+        if changed:
+            stmt = (update(self.posts).where(self.posts.c.id == bindparam("_id"))
+                    .values(version=self.posts.c.version + 1, updated_at=datetime.utcnow()))
+            self.session.execute(stmt, [{"_id": pid, **v} for pid, v in changed])
+            self.updated_posts.extend(pid for pid, _ in changed)
+            self.stats["posts_updated"] += len(changed)
+        new_ids = self._insert(self.posts, fresh_values)
+        for r, new_id in zip(fresh, new_ids):
+            for old_id in aliases[r["title"]]:
+                self.post_ids[old_id] = new_id
+        self.stats["posts"] += len(new_ids)
+        search.index_posts(self.session, [
+            SimpleNamespace(id=pid, **v) for pid, v in [*zip(new_ids, fresh_values), *changed]
+        ])
+
+    def _flush_comments(self, rows: list[dict]):
+        values = []
+        for r in rows:
+            if not r.get("text"):
+                self.error(r["_line"], "comment needs text")
+                continue
+            post_id = self.post_ids.get(r.get("post_id"))
+            if post_id is None:
+                # its post was skipped or updated in place (and keeps its own comments)
+                self.stats["skipped"] += 1
+                continue
+            values.append({"text": r["text"], "text_html": sanitize_html(r["text"]), "post_id": post_id,
+                           "author_id": self.user_ids.get(r.get("author_id"), self.default_author_id)})
+        new_ids = self._insert(self.comments, values)
+        search.index_comments(self.session, [
+            SimpleNamespace(id=new_id, post_id=v["post_id"], text_html=v["text_html"]) for v, new_id in zip(values, new_ids)
+        ])
+        self.stats["comments"] += len(new_ids)
+
+
+def import_ndjson(session, lines, user_model, post_model, comment_model, on_conflict: str = "skip",
+                  default_author_id: int | None = None, batch_size: int = IMPORT_BATCH) -> dict:
+    """
+    Ingest NDJSON `lines` (str or bytes). Posts whose title already exists are
+    skipped (on_conflict="skip") or overwritten in place ("update"). Returns
+    counts, the ids of updated posts and rows/sec. Each batch commits on its
+    own, so a failure part way leaves the earlier batches in place.
+    """
+    imp = _Importer(session, user_model, post_model, comment_model, on_conflict, default_author_id, batch_size)
+    started = time.perf_counter()
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            imp.error(lineno, f"invalid JSON ({e})")
+            continue
+        if not isinstance(row, dict):
+            imp.error(lineno, "expected a JSON object")
+            continue
+        imp.add(lineno, row)
+    imp.flush()
+    elapsed = time.perf_counter() - started
+    stats = imp.stats
+    rows = stats["users"] + stats["posts"] + stats["comments"] + stats["posts_updated"]
+    stats["updated_post_ids"] = imp.updated_posts
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_sec"] = round(rows / elapsed, 1) if elapsed else 0.0
+    return stats
@@ -0,0 +1,288 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from local_sqlite import LocalConnection
+
+
+# -----------------------------
+# Response cache backends
+# -----------------------------
+# Every backend stores opaque bytes under a string key, with a TTL and a
+# set of tags. invalidate(tag) drops exactly the keys stored under that tag,
+# so write handlers can say "post:7 changed" without knowing which query-arg
+# variants of /api/posts/7 happen to be cached.
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class LocalCache:
+    """
+    In-process LRU with per-entry TTL and a max entry count. Values are not
+    serialized, so it can also hold plain Python objects (see identity_cache).
+    With max_bytes set, it is also bounded by the sum of weigh(value) over its
+    entries, for caches whose values vary a lot in size (see avatar_cache).
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 30.0, max_bytes: int | None = None, weigh=len):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.weigh = weigh
+        self.bytes = 0
+        self.stats = CacheStats()
+        self._data: OrderedDict[str, tuple[float, object, tuple[str, ...]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> object | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            expires, value, _ = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                self.stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: object, tags: tuple[str, ...] = (), ttl: float | None = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (expires, value, tags)
+            if self.max_bytes is not None:
+                self.bytes += self.weigh(value)
+            for t in tags:
+                self._tags.setdefault(t, set()).add(key)
+            while len(self._data) > self.max_entries or (
+                    self.max_bytes is not None and self.bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.stats.evictions += 1
+
+    def invalidate(self, *tags: str):
+        with self._lock:
+            for t in tags:
+                for key in self._tags.pop(t, ()):
+                    self._drop(key)
+            self.stats.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self.bytes = 0
+
+    def size(self) -> int:
+        return len(self._data)
+
+    def _drop(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        if self.max_bytes is not None:
+            self.bytes -= self.weigh(entry[1])
+        for t in entry[2]:
+            keys = self._tags.get(t)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[t]
+
+
+class SQLiteCache:
+    """
+    Shared cache in a local SQLite file. Every gunicorn worker on the host
+    opens the same file, so an invalidation in one worker is seen by all.
+    This is the local stand-in for RedisCache.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 4096, ttl: float = 30.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._conn = LocalConnection(self.path, timeout=5)
+        with self._conn() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY, value BLOB NOT NULL,
+                    expires REAL NOT NULL, touched REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS cache_tags (
+                    tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key));
+                CREATE INDEX IF NOT EXISTS ix_cache_tags_key ON cache_tags (key);
+                CREATE INDEX IF NOT EXISTS ix_cache_entries_touched ON cache_entries (touched);
+            """)
+
+    def get(self, key: str) -> bytes | None:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < now:
+            self.stats.misses += 1
+            return None
+        conn.execute("UPDATE cache_entries SET touched = ? WHERE key = ?", (now, key))
+        self.stats.hits += 1
+        return bytes(row[0])
+
+    def set(self, key: str, value: bytes, tags: tuple[str, ...] = (), ttl: float | None = None):
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR REPLACE INTO cache_entries (key, value, expires, touched) VALUES (?, ?, ?, ?)",
+                         (key, value, expires, now))
+            conn.executemany("INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)",
+                             [(t, key) for t in tags])
+            (count,) = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                victims = conn.execute(
+                    "SELECT key FROM cache_entries ORDER BY touched LIMIT ?", (overflow,)
+                ).fetchall()
+                self._delete_keys(conn, [k for (k,) in victims])
+                self.stats.evictions += len(victims)
+
+    def invalidate(self, *tags: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            keys = set()
+            for t in tags:
+                keys.update(k for (k,) in conn.execute("SELECT key FROM cache_tags WHERE tag = ?", (t,)))
+            self._delete_keys(conn, list(keys))
+        self.stats.invalidations += 1
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM cache_entries")
+            conn.execute("DELETE FROM cache_tags")
+
+    def size(self) -> int:
+        (count,) = self._conn().execute("SELECT COUNT(*) FROM cache_entries").fetchone()
+        return count
+
+    @staticmethod
+    def _delete_keys(conn: sqlite3.Connection, keys: list[str]):
+        if not keys:
+            return
+        conn.executemany("DELETE FROM cache_entries WHERE key = ?", [(k,) for k in keys])
+        conn.executemany("DELETE FROM cache_tags WHERE key = ?", [(k,) for k in keys])
+
+
+class RedisCache:
+    """Shared cache in Redis (needs the optional `redis` package)."""
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl: float = 30.0, prefix: str = "blog:cache:"):
+        import redis  # optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> bytes | None:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes, tags: tuple[str, ...] = (), ttl: float | None = None):
+        ttl = int(self.ttl if ttl is None else ttl) or 1
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, value, ex=ttl)
+        for t in tags:
+            pipe.sadd(self.prefix + "tag:" + t, key)
+            pipe.expire(self.prefix + "tag:" + t, ttl * 4)
+        pipe.execute()
+
+    def invalidate(self, *tags: str):
+        for t in tags:
+            tag_key = self.prefix + "tag:" + t
+            keys = self.client.smembers(tag_key)
+            pipe = self.client.pipeline()
+            for k in keys:
+                pipe.delete(self.prefix + k.decode())
+            pipe.delete(tag_key)
+            pipe.execute()
+        self.stats.invalidations += 1
+
+    def clear(self):
+        for k in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(k)
+
+    def size(self) -> int:
+        return sum(1 for k in self.client.scan_iter(self.prefix + "*") if b":tag:" not in k)
+
+
+class NullCache:
+    """Cache that never stores anything (RESPONSE_CACHE_URL=none)."""
+
+    name = "none"
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key):
+        self.stats.misses += 1
+        return None
+
+    def set(self, key, value, tags=(), ttl=None):
+        pass
+
+    def invalidate(self, *tags):
+        pass
+
+    def clear(self):
+        pass
+
+    def size(self) -> int:
+        return 0
+
+
+def make_cache(url: str | None, max_entries: int = 1024, ttl: float = 30.0):
+    """
+    Build a backend from a URL-ish setting:
+      memory (default) | none | sqlite:///path/to/cache.db | redis://host:6379/0
+    """
+    url = (url or "memory").strip()
+    if url == "memory":
+        return LocalCache(max_entries=max_entries, ttl=ttl)
+    if url == "none":
+        return NullCache()
+    if url.startswith("sqlite:///"):
+        return SQLiteCache(url[len("sqlite:///"):], max_entries=max_entries, ttl=ttl)
+    if url.startswith(("redis://", "rediss://")):
+        return RedisCache(url, ttl=ttl)
+    raise ValueError(f"Unknown RESPONSE_CACHE_URL: {url!r}")
@@ -0,0 +1,137 @@
+import html
+import math
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from search import plain_text
+
+
+# -----------------------------
+# Write-time HTML processing
+# -----------------------------
+# CKEditor bodies and comments are sanitized once, when they are written,
+# against an allowlist. The result is stored next to the raw HTML along
+# with a plain-text excerpt and a reading time, so reads never parse HTML.
+# The raw HTML stays in its column for the editor.
+
+ALLOWED_TAGS = {
+    "a", "abbr", "b", "blockquote", "br", "caption", "code", "div", "em", "figcaption", "figure",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i", "img", "li", "ol", "p", "pre", "s", "span",
+    "strong", "sub", "sup", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "u", "ul",
+}
+ALLOWED_ATTRS = {
+    "a": {"href", "title"},
+    "img": {"src", "alt", "title", "width", "height"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan", "scope"},
+    "ol": {"start"},
+}
+URL_ATTRS = {"href", "src"}
+ALLOWED_SCHEMES = {"", "http", "https", "mailto"}
+# dropped together with everything inside them
+DROP_CONTENT = {"script", "style", "iframe", "object", "embed", "noscript", "template", "svg", "math"}
+VOID_TAGS = {"br", "hr", "img"}
+
+# browsers drop leading/trailing C0 controls and spaces from a URL, and tabs and
+# newlines anywhere in it, before reading the scheme; so must the check
+URL_TRIM = "".join(map(chr, range(0x21)))
+URL_DROP = dict.fromkeys(map(ord, "\t\n\r"))
+
+EXCERPT_CHARS = 200
+WORDS_PER_MINUTE = 200
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out: list[str] = []
+        self.open: list[str] = []
+        self.skipping = 0  # depth inside a DROP_CONTENT element
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT:
+            self.skipping += 1
+            return
+        if self.skipping or tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRS.get(tag, set())
+        parts = [tag]
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRS:
+                value = _safe_url(value)
+                if value is None:
+                    continue
+            parts.append(f'{name}="{html.escape(value, quote=True)}"')
+        if tag == "a":
+            parts.append('rel="nofollow noopener noreferrer"')
+        self.out.append(f"<{' '.join(parts)}>")
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in DROP_CONTENT:
+            self.skipping -= 1
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT:
+            self.skipping = max(0, self.skipping - 1)
+            return
+        if self.skipping or tag not in self.open:
+            return  # stray end tag
+        # close anything left open inside it, so the output is always well nested
+        while self.open:
+            top = self.open.pop()
+            self.out.append(f"</{top}>")
+            if top == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.out.append(html.escape(data, quote=False))
+
+    def result(self) -> str:
+        self.close()
+        self.out.extend(f"</{tag}>" for tag in reversed(self.open))
+        return "".join(self.out).strip()
+
+
+def _safe_url(value: str) -> str | None:
+    """The URL as a browser would read it, or None if its scheme isn't allowed."""
+    url = value.strip(URL_TRIM).translate(URL_DROP)
+    if any(c < " " or c == "\x7f" for c in url):
+        return None
+    try:
+        scheme = urlsplit(url).scheme.lower()
+    except ValueError:
+        return None
+    return url if scheme in ALLOWED_SCHEMES else None
+
+
+def sanitize_html(raw: str | None) -> str:
+    """Allowlist-sanitize CKEditor HTML into well-formed markup that is safe to render as-is."""
+    if not raw:
+        return ""
+    parser = _Sanitizer()
+    parser.feed(raw)
+    return parser.result()
+
+
+def excerpt(text: str, limit: int = EXCERPT_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:-") + "…"
+
+
+def reading_minutes(text: str) -> int:
+    return max(1, math.ceil(len(text.split()) / WORDS_PER_MINUTE))
+
+
+def render_body(raw: str | None) -> dict:
+    """Derived columns for a post body: body_html, excerpt, reading_minutes."""
+    body_html = sanitize_html(raw)
+    text = plain_text(body_html)  # from the sanitized markup, so dropped <script> text stays out
+    return {"body_html": body_html, "excerpt": excerpt(text), "reading_minutes": reading_minutes(text)}
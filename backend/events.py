@@ -0,0 +1,305 @@
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+from local_sqlite import LocalConnection
+
+log = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Live update fan-out (SSE)
+# -----------------------------
+# Write handlers publish small delta events ("comment.added", "post.pinned",
+# ...) on a channel: "feed", or "post:<id>" for one post's page. Every open
+# SSE stream is a Subscription: a bounded queue of ready-to-send frames fed
+# by its worker's broker. A frame is encoded once per event, not once per
+# subscriber, so fanning out to N streams costs N deque appends.
+#
+# LocalBroker delivers within one process only. With several gunicorn
+# workers, a stream must also see events published by the other workers,
+# so SQLiteBroker (a shared file tailed by one thread per worker) and
+# RedisBroker (PUBLISH/PSUBSCRIBE) relay every event to every worker, and
+# each worker then fans it out locally.
+#
+# Event ids increase across the whole broker, so a reconnecting client's
+# Last-Event-ID can be replayed from a short history. If the client has
+# fallen further behind than that, it gets a "resync" event and should
+# refetch.
+
+class Event:
+    __slots__ = ("id", "channel", "kind", "published_at", "frame")
+
+    def __init__(self, id: int, channel: str, kind: str, data: str, published_at: float):
+        self.id = id
+        self.channel = channel
+        self.kind = kind
+        self.published_at = published_at
+        self.frame = f"id: {id}\nevent: {kind}\ndata: {data}\n\n".encode()
+
+
+class Subscription:
+    __slots__ = ("channels", "frames", "queued_bytes", "overflowed", "closed", "_cond")
+
+    def __init__(self, channels: frozenset[str]):
+        self.channels = channels
+        self.frames: deque[Event] = deque()
+        self.queued_bytes = 0
+        self.overflowed = False  # too slow to keep up; the stream ends with a resync
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def push(self, event: Event, max_queue: int) -> bool:
+        with self._cond:
+            if len(self.frames) >= max_queue:
+                self.overflowed = True
+                self.frames.clear()
+                self.queued_bytes = 0
+                self._cond.notify()
+                return False
+            self.frames.append(event)
+            self.queued_bytes += len(event.frame)
+            self._cond.notify()
+            return True
+
+    def wait(self, timeout: float) -> list[Event]:
+        """Block up to `timeout` seconds for events; returns (and clears) whatever is queued."""
+        with self._cond:
+            if not self.frames and not self.overflowed and not self.closed:
+                self._cond.wait(timeout)
+            events = list(self.frames)
+            self.frames.clear()
+            self.queued_bytes = 0
+            return events
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def footprint(self) -> int:
+        """Approximate bytes held by this subscriber (frames are shared with other subscribers)."""
+        return sys.getsizeof(self) + sys.getsizeof(self.frames) + sys.getsizeof(self.channels) + self.queued_bytes
+
+
+class LocalBroker:
+    """Fan-out inside one process; the base the relaying brokers deliver through."""
+
+    name = "memory"
+    LATENCY_SAMPLES = 1024
+
+    def __init__(self, max_queue: int = 256, history: int = 512):
+        self.max_queue = max_queue
+        self._subs: dict[str, set[Subscription]] = {}  # channel -> subscribers
+        self._history: deque[Event] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.connections = 0
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self._latencies: deque[float] = deque(maxlen=self.LATENCY_SAMPLES)
+
+    # -- publishing --
+    def publish(self, channel: str, kind: str, data: dict):
+        with self._lock:
+            self._next_id += 1
+            event_id = self._next_id
+        self._deliver(Event(event_id, channel, kind, json.dumps(data, separators=(",", ":")), time.time()))
+
+    def _deliver(self, event: Event):
+        with self._lock:
+            self._history.append(event)
+            self.published += 1
+            targets = list(self._subs.get(event.channel, ()))
+        for sub in targets:
+            if sub.push(event, self.max_queue):
+                self.delivered += 1
+            else:
+                self.overflows += 1
+
+    # -- subscribing --
+    def subscribe(self, channels, last_event_id: int | None = None) -> tuple[Subscription, list[Event] | None]:
+        """
+        Register a stream on `channels`. Returns the subscription and the
+        events to replay after `last_event_id`, or None when they are no
+        longer in the history (the client must resync).
+        """
+        self._start()
+        sub = Subscription(frozenset(channels))
+        with self._lock:
+            for ch in sub.channels:
+                self._subs.setdefault(ch, set()).add(sub)
+            self.connections += 1
+            replay: list[Event] | None = []
+            if last_event_id is not None:
+                oldest = self._history[0].id if self._history else self._next_id + 1
+                if last_event_id + 1 < oldest or last_event_id > self._next_id:
+                    replay = None
+                else:
+                    replay = [e for e in self._history if e.id > last_event_id and e.channel in sub.channels]
+        return sub, replay
+
+    def unsubscribe(self, sub: Subscription):
+        sub.close()
+        with self._lock:
+            for ch in sub.channels:
+                subs = self._subs.get(ch)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subs[ch]
+            self.connections -= 1
+
+    def _start(self):
+        """Relaying brokers start their listener here, lazily, so nothing runs in the pre-fork master."""
+
+    # -- instrumentation --
+    def record_latency(self, event: Event):
+        self._latencies.append(time.time() - event.published_at)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subs = {s for group in self._subs.values() for s in group}
+        footprint = sum(s.footprint() for s in subs)
+        latencies = sorted(self._latencies)
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2) if latencies else 0.0
+
+        return {
+            "connections": self.connections,
+            "channels": len(self._subs),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "queued_bytes": sum(s.queued_bytes for s in subs),
+            "bytes_per_subscriber": footprint // len(subs) if subs else 0,
+            "fanout_ms_p50": pct(0.5),
+            "fanout_ms_p99": pct(0.99),
+            "fanout_ms_max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+
+
+class SQLiteBroker(LocalBroker):
+    """
+    Events go through a local SQLite file shared by every worker on the host;
+    each worker tails it from one thread. This is the stand-in for RedisBroker.
+    """
+
+    name = "sqlite"
+    RETAIN_SECONDS = 600
+    PRUNE_EVERY = 100  # publishes per worker between deletes of expired rows
+
+    def __init__(self, path: str, poll_interval: float = 0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.poll_interval = poll_interval
+        self._conn = LocalConnection(self.path, timeout=5)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()  # set by local publishes, so only other workers wait for the poll
+        self._inserts = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+            "kind TEXT NOT NULL, data TEXT NOT NULL, published_at REAL NOT NULL)"
+        )
+
+    def publish(self, channel: str, kind: str, data: dict):
+        # delivered (to this worker too) by the tail thread, so ids come from one sequence
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO events (channel, kind, data, published_at) VALUES (?, ?, ?, ?)",
+            (channel, kind, json.dumps(data, separators=(",", ":")), now),
+        )
+        self._wake.set()
+        # pruned here rather than by the tail thread, which only runs once something subscribes
+        with self._lock:
+            self._inserts += 1
+            prune = self._inserts % self.PRUNE_EVERY == 0
+        if prune:
+            conn.execute("DELETE FROM events WHERE published_at < ?", (now - self.RETAIN_SECONDS,))
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            (self._next_id,) = self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+            self._thread = threading.Thread(target=self._tail, name="sse-tail", daemon=True)
+            self._thread.start()
+
+    def _tail(self):
+        conn = self._conn()
+        while True:
+            rows = []
+            try:
+                rows = conn.execute(
+                    "SELECT id, channel, kind, data, published_at FROM events WHERE id > ? ORDER BY id LIMIT 1000",
+                    (self._next_id,),
+                ).fetchall()
+                for row in rows:
+                    self._next_id = row[0]
+                    self._deliver(Event(*row))
+            except sqlite3.Error:
+                log.exception("event tail failed; retrying")
+            if not rows:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+class RedisBroker(LocalBroker):
+    """Relay through Redis pub/sub (needs the optional `redis` package)."""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "blog:events:", **kwargs):
+        import redis  # optional dependency, only needed for this backend
+        super().__init__(**kwargs)
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def publish(self, channel: str, kind: str, data: dict):
+        event_id = self.client.incr(self.prefix + "seq")
+        self.client.publish(self.prefix + channel, json.dumps(
+            {"id": event_id, "kind": kind, "data": data, "published_at": time.time()}, separators=(",", ":")
+        ))
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._next_id = int(self.client.get(self.prefix + "seq") or 0)
+            self._thread = threading.Thread(target=self._listen, name="sse-redis", daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.prefix + "*")
+        for message in pubsub.listen():
+            try:
+                msg = json.loads(message["data"])
+                channel = message["channel"].decode()[len(self.prefix):]
+                self._next_id = max(self._next_id, msg["id"])
+                self._deliver(Event(msg["id"], channel, msg["kind"],
+                                    json.dumps(msg["data"], separators=(",", ":")), msg["published_at"]))
+            except (ValueError, KeyError):
+                log.warning("dropping malformed event message")
+
+
+def make_broker(url: str | None, max_queue: int = 256):
+    """memory (one process only) | sqlite:///path/to/events.db | redis://host:6379/0"""
+    url = (url or "memory").strip()
+    if url == "memory":
+        return LocalBroker(max_queue=max_queue)
+    if url.startswith("sqlite:///"):
+        return SQLiteBroker(url[len("sqlite:///"):], max_queue=max_queue)
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBroker(url, max_queue=max_queue)
+    raise ValueError(f"Unknown EVENTS_URL: {url!r}")
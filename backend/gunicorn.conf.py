@@ -0,0 +1,71 @@
+# Gunicorn settings for the Flask app (picked up from the backend dir,
+# or pass -c gunicorn.conf.py). Every value can be overridden from the env.
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND") or f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# gthread: requests wait on I/O (DB, password pool), so a few threads per worker
+# serve far more concurrent requests than one sync worker per process.
+# Live-update streams (/api/events) each hold a gthread thread for up to
+# SSE_MAX_SECONDS, so main.py caps them at GUNICORN_THREADS // 2 per worker.
+# For many open streams use GUNICORN_WORKER_CLASS=gevent (pip install gevent):
+# a stream is then a greenlet, capped at worker_connections // 2. Set
+# PASSWORD_HASH_PROCESSES=1 with gevent, so hashing doesn't stall the event loop.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY") or min(multiprocessing.cpu_count() * 2 + 1, 8))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+# main.py sizes each worker's DB pool from GUNICORN_THREADS (unless DB_POOL_SIZE
+# is set); export it so both sides agree. Postgres sees at most
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+os.environ.setdefault("GUNICORN_THREADS", str(threads))
+# both pick the SSE_MAX_CONNECTIONS default
+os.environ.setdefault("GUNICORN_WORKER_CLASS", worker_class)
+os.environ.setdefault("GUNICORN_WORKER_CONNECTIONS", str(worker_connections))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# set e.g. 2000 to recycle workers periodically if memory creeps up (0 = never)
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 0))
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG")  # e.g. "-" for stdout
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+
+def on_starting(server):
+    # Migrate once in the master, before any worker forks, so workers only
+    # read schema_version at import instead of racing each other on DDL.
+    # Doesn't import main: its thread pools must not be created pre-fork.
+    from dotenv import load_dotenv
+    import sqlalchemy as sa
+    import migrations
+
+    load_dotenv()
+    # Render (like most hosts) runs one proxy in front of gunicorn. Without
+    # ProxyFix every client has the proxy's IP, and the per-IP rate limits
+    # become one bucket shared by all visitors. Set 0 when clients connect directly.
+    os.environ.setdefault("TRUSTED_PROXY_COUNT", "1")
+    if os.environ.get("DB_AUTO_MIGRATE", "1") == "1":
+        here = os.path.dirname(os.path.abspath(__file__))
+        url = migrations.resolve_db_url(os.environ.get("DB_URI", "sqlite:///posts.db"), os.path.join(here, "instance"))
+        engine = sa.create_engine(url)
+        try:
+            applied = migrations.upgrade(engine)
+            if applied:
+                server.log.info("applied schema migrations %s", applied)
+        finally:
+            engine.dispose()
+    os.environ["DB_AUTO_MIGRATE"] = "0"
+
+    # best-quality .gz/.br next to the frontend build, so workers load them instead of compressing
+    from static_assets import precompress
+    dist = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend", "dist")
+    if os.path.isdir(dist):
+        try:
+            precompress(dist)
+        except OSError as e:
+            server.log.warning("could not precompress %s: %s", dist, e)
@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import traceback
+from collections import deque
+
+from local_sqlite import LocalConnection
+
+log = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Background jobs
+# -----------------------------
+# Side effects that don't have to finish before the response (search
+# indexing, count reconciliation, contact notifications) are queued as
+# jobs in a local SQLite file and run by a pool of threads. The pool runs
+# inside each web worker (JOB_WORKERS) and/or in dedicated
+# `flask jobs-worker` processes. A job is claimed before it runs. Claims
+# older than CLAIM_TIMEOUT are taken over, so jobs left by a crashed
+# worker still run (at-least-once), which means handlers must be
+# idempotent. A failing job is retried with exponential backoff and
+# jitter. After max_attempts it is kept as "dead" for inspection and
+# `flask jobs-requeue`.
+
+class JobQueue:
+    CLAIM_TIMEOUT = 300.0
+    THROUGHPUT_WINDOW = 60.0
+
+    def __init__(self, path: str, max_attempts: int = 5, backoff: float = 2.0,
+                 max_backoff: float = 600.0, poll_interval: float = 1.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.handlers: dict[str, callable] = {}
+        self._conn = LocalConnection(self.path, timeout=10, durable=True)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._owner = f"{os.getpid()}-{id(self)}"
+        self._lock = threading.Lock()
+        self._finished: deque[float] = deque()  # completion times inside THROUGHPUT_WINDOW
+        self.processed = 0
+        self.failed = 0
+        self.dead = 0
+        self.run_seconds_total = 0.0
+        self.run_seconds_max = 0.0
+        self.lag_seconds_max = 0.0
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                dedupe_key TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL,
+                run_at REAL NOT NULL,
+                claimed_by TEXT,
+                claimed_at REAL,
+                last_error TEXT);
+            CREATE INDEX IF NOT EXISTS ix_jobs_ready ON jobs (status, run_at, id);
+            CREATE INDEX IF NOT EXISTS ix_jobs_dedupe ON jobs (dedupe_key) WHERE dedupe_key IS NOT NULL;
+        """)
+
+    def task(self, name: str):
+        """Register fn(payload: dict) as the handler for jobs called `name`."""
+        def register(fn):
+            self.handlers[name] = fn
+            return fn
+        return register
+
+    # -- producer side --
+    def enqueue(self, name: str, payload: dict, delay: float = 0.0, dedupe_key: str | None = None) -> bool:
+        """
+        Queue a job; returns False when dedupe_key matched a job that is
+        still waiting to run (it will see the latest data anyway).
+        """
+        if name not in self.handlers:
+            raise ValueError(f"unknown job {name!r}")
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO jobs (name, payload, dedupe_key, enqueued_at, run_at) "
+            "SELECT ?, ?, ?, ?, ? WHERE ? IS NULL OR NOT EXISTS ("
+            " SELECT 1 FROM jobs WHERE dedupe_key = ? AND status = 'queued' AND claimed_at IS NULL)",
+            (name, json.dumps(payload), dedupe_key, now, now + delay, dedupe_key, dedupe_key),
+        )
+        if not delay:
+            self._wake.set()
+        return cur.rowcount == 1
+
+    # -- consumer side --
+    def _claim(self) -> tuple[int, str, str, int, float] | None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, name, payload, attempts, run_at FROM jobs WHERE status = 'queued' AND run_at <= ?"
+                " AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY run_at, id LIMIT 1",
+                (now, now - self.CLAIM_TIMEOUT),
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET claimed_by = ?, claimed_at = ? WHERE id = ?", (self._owner, now, row[0]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def run_once(self) -> bool:
+        """Claim and run one ready job; returns False when none was ready."""
+        row = self._claim()
+        if row is None:
+            return False
+        job_id, name, payload, attempts, run_at = row
+        t0 = time.perf_counter()
+        lag = time.time() - run_at
+        try:
+            handler = self.handlers.get(name)
+            if handler is None:
+                raise LookupError(f"no handler registered for {name!r}")
+            handler(json.loads(payload))
+        except Exception as e:
+            self._failed(job_id, name, attempts + 1, e)
+        else:
+            self._conn().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self.processed += 1
+            self.run_seconds_total += elapsed
+            self.run_seconds_max = max(self.run_seconds_max, elapsed)
+            self.lag_seconds_max = max(self.lag_seconds_max, lag)
+            now = time.monotonic()
+            self._finished.append(now)
+            while self._finished and self._finished[0] < now - self.THROUGHPUT_WINDOW:
+                self._finished.popleft()
+        return True
+
+    def _failed(self, job_id: int, name: str, attempts: int, error: Exception):
+        message = "".join(traceback.format_exception_only(error)).strip()[:2000]
+        with self._lock:
+            self.failed += 1
+        if attempts >= self.max_attempts:
+            with self._lock:
+                self.dead += 1
+            log.error("job %s #%d failed %d times, giving up: %s", name, job_id, attempts, message)
+            self._conn().execute(
+                "UPDATE jobs SET status = 'dead', attempts = ?, last_error = ?, claimed_by = NULL, "
+                "claimed_at = NULL WHERE id = ?", (attempts, message, job_id),
+            )
+            return
+        # exponential backoff with +-50% jitter, so a burst of failures doesn't retry in lockstep
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+        log.warning("job %s #%d failed (attempt %d), retrying in %.1fs: %s", name, job_id, attempts, delay, message)
+        self._conn().execute(
+            "UPDATE jobs SET attempts = ?, last_error = ?, run_at = ?, claimed_by = NULL, claimed_at = NULL "
+            "WHERE id = ?", (attempts, message, time.time() + delay, job_id),
+        )
+
+    def drain(self, max_jobs: int = 10000) -> int:
+        """Run ready jobs on the calling thread until none are left; returns how many ran."""
+        ran = 0
+        while ran < max_jobs and self.run_once():
+            ran += 1
+        return ran
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                while not self._stop.is_set() and self.run_once():
+                    pass
+            except Exception:
+                log.exception("job worker error")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self, threads: int = 2):
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(threads):
+            t = threading.Thread(target=self._run, name=f"jobs-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the pool after the jobs that are running finish; queued jobs stay queued."""
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def requeue_dead(self, name: str | None = None) -> int:
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = 'queued', attempts = 0, run_at = ? WHERE status = 'dead' AND (? IS NULL OR name = ?)",
+            (time.time(), name, name),
+        )
+        self._wake.set()
+        return cur.rowcount
+
+    def stats(self) -> dict:
+        now = time.time()
+        conn = self._conn()
+        ready, oldest = conn.execute(
+            "SELECT COUNT(*), MIN(run_at) FROM jobs WHERE status = 'queued' AND run_at <= ?", (now,)
+        ).fetchone()
+        (scheduled,) = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND run_at > ?", (now,)
+        ).fetchone()
+        (dead,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'dead'").fetchone()
+        with self._lock:
+            recent = sum(1 for t in self._finished if t >= time.monotonic() - self.THROUGHPUT_WINDOW)
+            return {
+                # shared by every process using the file
+                "ready": ready,
+                "scheduled": scheduled,
+                "dead": dead,
+                "lag_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+                # this process
+                "workers": len(self._threads),
+                "processed": self.processed,
+                "failed": self.failed,
+                "gave_up": self.dead,
+                "jobs_per_sec": round(recent / self.THROUGHPUT_WINDOW, 3),
+                "lag_seconds_max": round(self.lag_seconds_max, 3),
+                "run_seconds_max": round(self.run_seconds_max, 6),
+                "run_seconds_avg": round(self.run_seconds_total / self.processed, 6) if self.processed else 0.0,
+            }
@@ -0,0 +1,37 @@
+import sqlite3
+import threading
+
+
+# -----------------------------
+# Local SQLite side files
+# -----------------------------
+# The response cache, rate limiter, SSE relay, write-behind queue and job
+# queue each keep state in a SQLite file that every worker on the host
+# opens. sqlite3 connections can't be shared between threads, so each
+# thread gets its own, in autocommit mode (callers BEGIN explicitly where
+# they need a transaction) and in WAL mode so readers don't block the writer.
+#
+# synchronous=NORMAL under WAL can lose the last few commits on a power cut,
+# but never corrupts the file. That is fine for state that is rebuilt or
+# expires anyway (cache entries, rate buckets, relayed events). A queue
+# whose rows are the only copy of work already acknowledged to a client
+# (write-behind, jobs) passes durable=True for FULL: an acknowledged
+# enqueue must survive a power cut.
+
+class LocalConnection:
+    """Callable returning the calling thread's connection to `path`, opened on first use."""
+
+    def __init__(self, path: str, timeout: float = 5.0, durable: bool = False):
+        self.path = path
+        self.timeout = timeout
+        self.synchronous = "FULL" if durable else "NORMAL"
+        self._local = threading.local()
+
+    def __call__(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+        return conn
@@ -1,12 +1,23 @@
 from datetime import date
 from datetime import datetime
+import atexit
+import json
+import math
 import os
-from functools import wraps
+import re
+import sys
+import signal
+import smtplib
+import sqlite3
+import time
+from functools import wraps, lru_cache
+from types import SimpleNamespace
 from hashlib import md5
+import click
 from dotenv import load_dotenv
 from flask import (
     Flask, abort, render_template, redirect, url_for, flash, request,
-    jsonify, send_from_directory
+    jsonify, session, g, stream_with_context
 )
 from flask_bootstrap import Bootstrap5
 from flask_ckeditor import CKEditor
@@ -15,13 +26,32 @@ from flask_login import (
     UserMixin, login_user, LoginManager, current_user, logout_user, login_required
 )
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import relationship, DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import Integer, String, Text, Boolean, text
-from sqlalchemy import inspect as sa_inspect
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import relationship, DeclarativeBase, Mapped, mapped_column, undefer, Session, validates
+from sqlalchemy import Integer, String, Text, Boolean, DateTime, or_, and_, func, event
+from sqlalchemy.engine import Engine, make_url
 from flask_wtf import CSRFProtect
+from flask_wtf.csrf import generate_csrf
 # Optional: from flask_cors import CORS  # only needed if FE/BE are on different domains
 from forms import CreatePostForm, RegisterForm, LoginForm, CommentForm
+from cache import make_cache, LocalCache
+import search
+import migrations
+import bulk
+from passwords import PasswordHasher, HasherBusy
+from writebehind import WriteBehindQueue, QueueFull
+from metrics import RequestMetrics
+from serializers import Schema, Field, UnknownFields, make_json_provider
+from static_assets import StaticManifest, precompress
+from render_cache import FragmentCacheExtension
+from content import render_body, sanitize_html
+from ratelimit import make_limiter, parse_limit, RateLimited
+from events import make_broker
+from jobs import JobQueue
+from email.message import EmailMessage
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.test import EnvironBuilder
+from urllib.parse import urlsplit
+from urllib.request import urlopen
 
 # -----------------------------
 # Env & App Setup
@@ -54,7 +84,155 @@ app.config.setdefault("SESSION_COOKIE_SECURE", False)  # True when behind HTTPS
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DB_URI", "sqlite:///posts.db")
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Connection pool (per gunicorn worker). The default pool size matches
+# GUNICORN_THREADS (see gunicorn.conf.py), so every request thread in a
+# worker can hold a connection without waiting on the pool.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),  # under typical server/proxy idle limits
+    "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+}
+_db_url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+if _db_url.get_backend_name() == "sqlite":
+    # a local file doesn't drop idle connections; skip the per-checkout ping
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']["pool_pre_ping"] = False
+if not (_db_url.get_backend_name() == "sqlite" and (
+        _db_url.database in (None, "", ":memory:") or _db_url.query.get("mode") == "memory")):
+    # in-memory SQLite gets a static/singleton pool, which takes no size arguments
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update(
+        pool_size=int(os.environ.get("DB_POOL_SIZE") or os.environ.get("GUNICORN_THREADS", 4)),
+        max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", 2)),
+        pool_timeout=float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+    )
+
+# SQLite pragmas, applied to every new connection (see set_sqlite_pragmas)
+app.config['SQLITE_JOURNAL_MODE'] = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+app.config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 16 * 1024))
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_conn, connection_record):
+    # WAL lets readers run alongside the single writer; NORMAL sync is safe under WAL
+    # (a power cut can lose the last commits, never corrupt the file).
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cur = dbapi_conn.cursor()
+    cur.execute(f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}")
+    cur.execute(f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}")
+    cur.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+    cur.execute(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE']}")
+    cur.execute(f"PRAGMA cache_size=-{app.config['SQLITE_CACHE_SIZE_KB']}")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.close()
+
+# Response cache for the anonymous read endpoints:
+# memory (per worker LRU) | none | sqlite:///path (shared by workers on a host) | redis://...
+app.config['RESPONSE_CACHE_URL'] = os.environ.get("RESPONSE_CACHE_URL", "memory")
+app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+app.config['RESPONSE_CACHE_TTL'] = float(os.environ.get("RESPONSE_CACHE_TTL", 30))
+
+# Password hashing: werkzeug method string (cost included) + salt length.
+# Changing either rehashes each user's stored hash on their next login.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get("PASSWORD_HASH_METHOD", "pbkdf2:sha256:600000")
+app.config['PASSWORD_SALT_LENGTH'] = int(os.environ.get("PASSWORD_SALT_LENGTH", 16))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get("PASSWORD_HASH_QUEUE", 16))
+app.config['PASSWORD_HASH_PROCESSES'] = os.environ.get("PASSWORD_HASH_PROCESSES", "0") == "1"
+
+# Opt-in write-behind: contact messages (and optionally comments) are queued in a
+# local SQLite file and flushed to the DB in batches by a background thread.
+app.config['WRITE_BEHIND'] = os.environ.get("WRITE_BEHIND", "0") == "1"
+app.config['WRITE_BEHIND_COMMENTS'] = os.environ.get("WRITE_BEHIND_COMMENTS", "0") == "1"
+app.config['WRITE_BEHIND_PATH'] = os.environ.get("WRITE_BEHIND_PATH") or os.path.join(app.instance_path, "writebehind.db")
+app.config['WRITE_BEHIND_BATCH'] = int(os.environ.get("WRITE_BEHIND_BATCH", 200))
+app.config['WRITE_BEHIND_MAX_DEPTH'] = int(os.environ.get("WRITE_BEHIND_MAX_DEPTH", 10000))
+
+# Background jobs (see jobs.py): post-write side effects are queued in a local SQLite
+# file and run by JOB_WORKERS threads in every web worker. Set JOB_WORKERS=0 and run
+# `flask jobs-worker` to move them to dedicated processes on the same host.
+app.config['JOBS_PATH'] = os.environ.get("JOBS_PATH") or os.path.join(app.instance_path, "jobs.db")
+app.config['JOB_WORKERS'] = int(os.environ.get("JOB_WORKERS", 2))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get("JOB_MAX_ATTEMPTS", 5))
+# Contact form notifications go out over SMTP once SMTP_HOST and CONTACT_NOTIFY_TO are set
+app.config['SMTP_HOST'] = os.environ.get("SMTP_HOST")
+app.config['SMTP_PORT'] = int(os.environ.get("SMTP_PORT", 587))
+app.config['SMTP_USER'] = os.environ.get("SMTP_USER")
+app.config['SMTP_PASSWORD'] = os.environ.get("SMTP_PASSWORD")
+app.config['SMTP_FROM'] = os.environ.get("SMTP_FROM") or os.environ.get("SMTP_USER")
+app.config['CONTACT_NOTIFY_TO'] = os.environ.get("CONTACT_NOTIFY_TO")
+
+# Request instrumentation (see metrics.py). /api/_metrics accepts an admin
+# session or "Authorization: Bearer $METRICS_TOKEN" for scrapers.
+app.config['METRICS_TOKEN'] = os.environ.get("METRICS_TOKEN")
+app.config['METRICS_SERVER_TIMING'] = os.environ.get("METRICS_SERVER_TIMING", "0") == "1"
+app.config['METRICS_SLOW_MS'] = float(os.environ.get("METRICS_SLOW_MS", 500))
+app.config['METRICS_PROFILE_DIR'] = os.environ.get("METRICS_PROFILE_DIR")  # set to dump cProfile of slow requests
+# API JSON encoder (see serializers.py): auto (orjson when installed) | orjson | json
+app.config['JSON_ENCODER'] = os.environ.get("JSON_ENCODER", "auto")
+
+# AVATAR_PROXY=1 points avatar URLs at /api/avatar/<hash>, which fetches from
+# gravatar once and serves cached copies, so a page with many comments makes
+# its image requests to us (one connection) instead of to gravatar.com.
+app.config['AVATAR_PROXY'] = os.environ.get("AVATAR_PROXY", "0") == "1"
+app.config['AVATAR_CACHE_TTL'] = float(os.environ.get("AVATAR_CACHE_TTL", 86400))
+# bound on the image bytes each worker keeps (avatars are a few KB; one is capped at 256 KB)
+app.config['AVATAR_CACHE_MAX_BYTES'] = int(os.environ.get("AVATAR_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+# Abuse throttling (see ratelimit.py): memory (per worker) | none |
+# sqlite:///path (shared by workers on a host) | redis://...
+# Each rule is "N/period"; override one with e.g. RATE_LIMIT_LOGIN_IP=50/minute, "0/minute" disables it.
+app.config['RATE_LIMIT_URL'] = os.environ.get("RATE_LIMIT_URL", "memory")
+app.config['RATE_LIMIT_MAX_KEYS'] = int(os.environ.get("RATE_LIMIT_MAX_KEYS", 100_000))
+app.config['RATE_LIMITS'] = {
+    rule: os.environ.get(f"RATE_LIMIT_{rule.upper()}", default)
+    for rule, default in {
+        "login_ip": "20/minute",
+        "login_account": "10/minute",  # per submitted email: slows guessing against one account
+        "register_ip": "10/hour",
+        "comment_user": "10/minute",
+        "comment_ip": "30/minute",
+        "contact_ip": "5/hour",
+        "avatar_ip": "120/minute",  # gravatar fetches on proxy cache misses (AVATAR_PROXY)
+    }.items()
+}
+# Live updates over SSE (see events.py): sqlite:///path relays events between the
+# workers on a host (default) | redis://... across hosts | memory (single worker only).
+# Under gthread every open stream holds a thread, so streams are capped at half of
+# GUNICORN_THREADS; GUNICORN_WORKER_CLASS=gevent (pip install gevent) makes them cheap.
+app.config['EVENTS_URL'] = os.environ.get("EVENTS_URL") or "sqlite:///" + os.path.join(app.instance_path, "events.db")
+app.config['SSE_HEARTBEAT'] = float(os.environ.get("SSE_HEARTBEAT", 15))
+app.config['SSE_MAX_SECONDS'] = float(os.environ.get("SSE_MAX_SECONDS", 300))  # then the browser reconnects
+app.config['SSE_QUEUE_SIZE'] = int(os.environ.get("SSE_QUEUE_SIZE", 256))
+_async_worker = os.environ.get("GUNICORN_WORKER_CLASS", "gthread") in ("gevent", "eventlet")
+app.config['SSE_MAX_CONNECTIONS'] = int(
+    os.environ.get("SSE_MAX_CONNECTIONS")
+    # at most half of a worker's threads / greenlets, so ordinary requests still get served
+    or max(1, int(os.environ.get("GUNICORN_WORKER_CONNECTIONS" if _async_worker else "GUNICORN_THREADS",
+                                 1000 if _async_worker else 4)) // 2)
+)
+
+# Behind Render/nginx every request comes from the proxy; set this to the number
+# of proxies in front of the app so request.remote_addr is the client again.
+# gunicorn.conf.py defaults it to 1; the dev server trusts no proxy.
+app.config['TRUSTED_PROXY_COUNT'] = int(os.environ.get("TRUSTED_PROXY_COUNT", 0))
+if app.config['TRUSTED_PROXY_COUNT']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'],
+                            x_proto=app.config['TRUSTED_PROXY_COUNT'])
+else:
+    _proxy_warned = False
+
+    @app.before_request
+    def warn_untrusted_proxy():
+        global _proxy_warned
+        if not _proxy_warned and request.headers.get("X-Forwarded-For"):
+            _proxy_warned = True
+            app.logger.warning("X-Forwarded-For received but TRUSTED_PROXY_COUNT=0: rate limits key on "
+                               "the proxy's address (%s), so all clients share them", request.remote_addr)
+
 ckeditor = CKEditor(app)
+request_metrics = RequestMetrics(app)
+app.json = make_json_provider(app, app.config['JSON_ENCODER'])
 Bootstrap5(app)
 csrf = CSRFProtect(app)
 # If splitting FE/BE across domains, uncomment and set origins:
@@ -94,40 +272,445 @@ class BlogPost(db.Model):
     title: Mapped[str] = mapped_column(String(250), unique=True, nullable=False)
     subtitle: Mapped[str] = mapped_column(String(250), nullable=False)
     date: Mapped[str] = mapped_column(String(250), nullable=False)
-    body: Mapped[str] = mapped_column(Text, nullable=False)
+    # raw CKEditor HTML, only needed by the editor; readers get body_html
+    body: Mapped[str] = mapped_column(Text, nullable=False, deferred=True)
+    # derived from body on assignment (see _render_body): sanitized HTML,
+    # plain-text excerpt and reading time. Load body_html with undefer() where shown.
+    body_html: Mapped[str | None] = mapped_column(Text, deferred=True)
+    excerpt: Mapped[str | None] = mapped_column(String(300))
+    reading_minutes: Mapped[int | None] = mapped_column(Integer)
     img_url: Mapped[str] = mapped_column(String(250), nullable=False)
     pinned: Mapped[bool]= mapped_column(Boolean, default=False, nullable=False)
+    # bumped on every change to the post or its comments (see bump_versions); drives ETags
+    version: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     comments = relationship("Comment", back_populates="parent_post", cascade="all, delete-orphan")
+    # feed order is (pinned DESC, id DESC); keyset pagination walks this index
+    __table_args__ = (db.Index("ix_blog_posts_pinned_id", "pinned", "id"),)
+
+    @validates("body")
+    def _render_body(self, key, body):
+        for column, value in render_body(body).items():
+            setattr(self, column, value)
+        return body
+
+class FeedEntry(db.Model):
+    """
+    Denormalized home-feed row per post (no body, author name and comment
+    count inlined). Kept in step by the post/comment/pin handlers via
+    sync_feed_entry / drop_feed_entry / bump_feed_comments.
+    """
+    __tablename__ = "feed_entries"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)  # == blog_posts.id
+    title: Mapped[str] = mapped_column(String(250), nullable=False)
+    subtitle: Mapped[str] = mapped_column(String(250), nullable=False)
+    date: Mapped[str] = mapped_column(String(250), nullable=False)
+    img_url: Mapped[str] = mapped_column(String(250), nullable=False)
+    author_name: Mapped[str | None] = mapped_column(String(100))
+    pinned: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    comment_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    excerpt: Mapped[str | None] = mapped_column(String(300))
+    reading_minutes: Mapped[int | None] = mapped_column(Integer)
+    __table_args__ = (db.Index("ix_feed_entries_pinned_id", "pinned", "id"),)
+
+    @property
+    def author(self):
+        # index.html is written against BlogPost and reads post.author.name
+        return SimpleNamespace(name=self.author_name)
+
+class FeedVersion(db.Model):
+    """
+    One row, bumped in the same transaction as every write to feed_entries
+    (see bump_feed_version). The feed's ETag/Last-Modified come from it, so
+    stamping the feed is a primary-key lookup rather than an aggregate.
+    """
+    __tablename__ = "feed_version"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
 
 class User(UserMixin, db.Model):
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     email: Mapped[str] = mapped_column(String(100), unique=True)
-    password: Mapped[str] = mapped_column(String(100))
+    password: Mapped[str] = mapped_column(String(255))
     name: Mapped[str] = mapped_column(String(100))
+    # md5 of the normalized email, kept in step with it by the validator below
+    avatar_hash: Mapped[str | None] = mapped_column(String(32))
     posts = relationship("BlogPost", back_populates="author")
     comments = relationship("Comment", back_populates="comment_author")
 
+    @validates("email")
+    def _sync_avatar_hash(self, key, email):
+        self.avatar_hash = gravatar_hash(email) if email else None
+        return email
+
 class Comment(db.Model):
     __tablename__ = "comments"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     text: Mapped[str] = mapped_column(Text, nullable=False)
-    author_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("users.id"))
+    author_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("users.id"), index=True)
     comment_author = relationship("User", back_populates="comments")
-    post_id: Mapped[str] = mapped_column(Integer, db.ForeignKey("blog_posts.id"))
+    post_id: Mapped[str] = mapped_column(Integer, db.ForeignKey("blog_posts.id"), index=True)
     parent_post = relationship("BlogPost", back_populates="comments")
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow)
+    text_html: Mapped[str | None] = mapped_column(Text)  # sanitized `text`, for templates
 
+    @validates("text")
+    def _render_text(self, key, text):
+        self.text_html = sanitize_html(text)
+        return text
+
+@event.listens_for(Session, "before_flush")
+def bump_versions(session, flush_context, instances):
+    # One place for every mutation path: touching a post or any of its
+    # comments moves the post's version/updated_at forward.
+    now = datetime.utcnow()
+    touched = set()
+    for obj in list(session.dirty) + list(session.new) + list(session.deleted):
+        if isinstance(obj, BlogPost) and obj in session.dirty and session.is_modified(obj):
+            touched.add(obj)
+        elif isinstance(obj, Comment):
+            if obj not in session.deleted:
+                obj.updated_at = now
+            post = obj.parent_post or (obj.post_id and session.get(BlogPost, obj.post_id))
+            if post is not None and post not in session.deleted and post not in session.new:
+                touched.add(post)
+    for post in touched:
+        post.version = (post.version or 0) + 1
+        post.updated_at = now
+
+def rebuild_feed():
+    """Recompute feed_entries from blog_posts/users/comments in one INSERT ... SELECT."""
+    counts = (db.select(Comment.post_id, func.count(Comment.id).label("n"))
+              .group_by(Comment.post_id).subquery())
+    source = (db.select(BlogPost.id, BlogPost.title, BlogPost.subtitle, BlogPost.date,
+                        BlogPost.img_url, User.name, BlogPost.pinned, func.coalesce(counts.c.n, 0),
+                        BlogPost.excerpt, BlogPost.reading_minutes)
+              .outerjoin(User, User.id == BlogPost.author_id)
+              .outerjoin(counts, counts.c.post_id == BlogPost.id))
+    db.session.execute(db.delete(FeedEntry))
+    db.session.execute(db.insert(FeedEntry).from_select(
+        ["id", "title", "subtitle", "date", "img_url", "author_name", "pinned", "comment_count",
+         "excerpt", "reading_minutes"], source
+    ))
+    bump_feed_version()
+    db.session.commit()
+
+def backfill_avatar_hashes(batch_size: int = 1000) -> int:
+    """Fill users.avatar_hash where it is NULL; returns the number of rows updated."""
+    done = 0
+    while True:
+        rows = db.session.execute(
+            db.select(User.id, User.email).where(User.avatar_hash.is_(None), User.email.is_not(None))
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return done
+        db.session.execute(db.update(User), [{"id": r.id, "avatar_hash": gravatar_hash(r.email)} for r in rows])
+        db.session.commit()
+        done += len(rows)
+
+def backfill_content(batch_size: int = 500) -> tuple[int, int]:
+    """
+    Fill body_html/excerpt/reading_minutes and comments.text_html for rows
+    written before they existed (or by bulk import), in keyset batches. Bulk
+    UPDATEs skip before_flush, so versions and ETags don't move.
+    """
+    posts = comments = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(BlogPost.id, BlogPost.title, BlogPost.subtitle, BlogPost.body)
+            .where(BlogPost.body_html.is_(None), BlogPost.id > last_id)
+            .order_by(BlogPost.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        values = [{"id": r.id, **render_body(r.body)} for r in rows]
+        db.session.execute(db.update(BlogPost), values)
+        # search documents are built from body_html, so these rows are re-indexed too
+        search.index_posts(db.session, [SimpleNamespace(title=r.title, subtitle=r.subtitle, **v)
+                                        for r, v in zip(rows, values)])
+        db.session.commit()
+        posts += len(rows)
+        last_id = rows[-1].id
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Comment.id, Comment.post_id, Comment.text)
+            .where(Comment.text_html.is_(None), Comment.id > last_id)
+            .order_by(Comment.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        values = [{"id": r.id, "text_html": sanitize_html(r.text)} for r in rows]
+        db.session.execute(db.update(Comment), values)
+        search.index_comments(db.session, [SimpleNamespace(post_id=r.post_id, **v) for r, v in zip(rows, values)])
+        db.session.commit()
+        comments += len(rows)
+        last_id = rows[-1].id
+    if posts:
+        rebuild_feed()  # picks up the new excerpts
+    return posts, comments
+
+def bump_feed_version():
+    db.session.execute(
+        db.update(FeedVersion).values(version=FeedVersion.version + 1, updated_at=datetime.utcnow())
+    )
+
+def sync_feed_entry(p: BlogPost, author_name: str | None = None) -> "FeedEntry":
+    """Upsert p's feed row; author_name=None keeps the stored name (e.g. for pin toggles)."""
+    entry = db.session.get(FeedEntry, p.id)
+    if entry is None:
+        entry = FeedEntry(id=p.id, comment_count=0)
+        db.session.add(entry)
+    entry.title = p.title
+    entry.subtitle = p.subtitle
+    entry.date = p.date
+    entry.img_url = p.img_url
+    entry.pinned = bool(p.pinned)
+    entry.excerpt = p.excerpt
+    entry.reading_minutes = p.reading_minutes
+    if author_name is not None:
+        entry.author_name = author_name
+    bump_feed_version()
+    return entry
+
+def drop_feed_entry(pid: int):
+    db.session.execute(db.delete(FeedEntry).where(FeedEntry.id == pid))
+    bump_feed_version()
+
+def bump_feed_comments(pid: int, delta: int):
+    db.session.execute(
+        db.update(FeedEntry).where(FeedEntry.id == pid)
+        .values(comment_count=FeedEntry.comment_count + delta)
+    )
+    bump_feed_version()
+
+# Schema changes live in migrations.py. Startup only reads schema_version;
+# with DB_AUTO_MIGRATE=0 (set for gunicorn workers, whose master already
+# migrated) an out-of-date database is logged instead of upgraded.
+app.config['DB_AUTO_MIGRATE'] = os.environ.get("DB_AUTO_MIGRATE", "1") == "1"
 with app.app_context():
-    db.create_all()
-    insp = sa_inspect(db.engine)
-    cols = [c['name'] for c in insp.get_columns('blog_posts')]
-    if 'pinned' not in cols:
-        db.session.execute(text('ALTER TABLE blog_posts ADD COLUMN pinned BOOLEAN NOT NULL DEFAULT 0'))
+    migrations.ensure_current(db.engine, auto=app.config['DB_AUTO_MIGRATE'])
+
+class SessionUser(UserMixin):
+    """
+    Detached snapshot of the User columns requests need (id, name, email, avatar_hash).
+    load_user hands these out from a small per-worker cache instead of
+    querying users on every authenticated request. Use author_id=... rather
+    than assigning it to relationships.
+    """
+    def __init__(self, id: int, name: str, email: str, avatar_hash: str | None = None):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.avatar_hash = avatar_hash
+        self.is_admin = bool(compute_is_admin(id, email))
+
+# per worker; other workers see profile changes after at most IDENTITY_CACHE_TTL seconds
+app.config['IDENTITY_CACHE_TTL'] = float(os.environ.get("IDENTITY_CACHE_TTL", 60))
+identity_cache = LocalCache(max_entries=4096, ttl=app.config['IDENTITY_CACHE_TTL'])
+
+def remember_identity(user) -> SessionUser:
+    ident = SessionUser(user.id, user.name, user.email, user.avatar_hash)
+    identity_cache.set(str(user.id), ident, (f"user:{user.id}",))
+    return ident
+
+def forget_identity(user_id):
+    """Call after logout or any change to a user's name/email."""
+    identity_cache.invalidate(f"user:{user_id}")
+
+hasher = PasswordHasher(
+    method=app.config['PASSWORD_HASH_METHOD'],
+    salt_length=app.config['PASSWORD_SALT_LENGTH'],
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_pending=app.config['PASSWORD_HASH_QUEUE'],
+    use_processes=app.config['PASSWORD_HASH_PROCESSES'],
+)
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(e):
+    return jsonify({"error": "Too many sign-ins right now, please retry"}), 503, {"Retry-After": "1"}
+
+def check_user_password(user: "User", password: str) -> bool:
+    """Verify on the hashing pool; upgrade the stored hash if the configured cost changed."""
+    if not hasher.verify(user.password, password):
+        return False
+    if hasher.needs_rehash(user.password):
+        user.password = hasher.hash(password)
         db.session.commit()
+    return True
+
+def flush_pending_writes(kind: str, payloads: list[dict]):
+    with app.app_context():
+        if kind == "contact":
+            db.session.execute(db.insert(ContactMessage), payloads)
+            db.session.commit()
+        elif kind == "comment":
+            # the post may have been deleted while its comments sat in the queue
+            post_ids = {p["post_id"] for p in payloads}
+            live = set(db.session.execute(
+                db.select(BlogPost.id).where(BlogPost.id.in_(post_ids))
+            ).scalars())
+            comments = [Comment(**p) for p in payloads if p["post_id"] in live]
+            db.session.add_all(comments)
+            db.session.flush()
+            per_post: dict[int, int] = {}
+            for c in comments:
+                search.index_comment(db.session, c)
+                per_post[c.post_id] = per_post.get(c.post_id, 0) + 1
+            for pid, n in per_post.items():
+                bump_feed_comments(pid, n)
+            # one query for the authors instead of a lazy load per comment
+            db.session.execute(db.select(User).where(User.id.in_({c.author_id for c in comments}))).all()
+            added = [(c.post_id, serialize_comment(c)) for c in comments]
+            db.session.commit()
+            invalidate_cache("feed", *(post_tag(pid) for pid in live))
+            for pid, data in added:
+                publish_event("comment.added", {"post_id": pid, **data}, post_tag(pid))
+            for pid, n in per_post.items():
+                publish_event("post.comments", {"id": pid, "delta": n}, "feed")
+        else:
+            raise ValueError(f"unknown write-behind kind {kind!r}")
+
+write_queue = None
+if app.config['WRITE_BEHIND']:
+    os.makedirs(os.path.dirname(app.config['WRITE_BEHIND_PATH']), exist_ok=True)
+    write_queue = WriteBehindQueue(
+        app.config['WRITE_BEHIND_PATH'], flush_pending_writes,
+        batch_size=app.config['WRITE_BEHIND_BATCH'],
+        max_depth=app.config['WRITE_BEHIND_MAX_DEPTH'],
+    )
+    write_queue.start()
+    atexit.register(write_queue.stop)  # drain on worker shutdown
+
+if write_queue is not None:
+    request_metrics.register_gauge("write_queue_depth", lambda: write_queue.stats()["depth"])
+
+@app.errorhandler(QueueFull)
+def write_queue_full(e):
+    return jsonify({"error": "Busy, please retry shortly"}), 503, {"Retry-After": "5"}
+
+os.makedirs(os.path.dirname(app.config['JOBS_PATH']), exist_ok=True)
+job_queue = JobQueue(app.config['JOBS_PATH'], max_attempts=app.config['JOB_MAX_ATTEMPTS'])
+request_metrics.register_gauge("jobs", job_queue.stats)
+
+def enqueue_job(name: str, payload: dict, dedupe_key: str | None = None):
+    """Queue a background job after the commit it follows; runs it inline if the queue file is unusable."""
+    try:
+        job_queue.enqueue(name, payload, dedupe_key=dedupe_key)
+    except sqlite3.Error:
+        app.logger.exception("could not queue job %s; running it inline", name)
+        job_queue.handlers[name](payload)
+
+@job_queue.task("search.index_post")
+def index_post_job(payload: dict):
+    with app.app_context():
+        p = db.session.get(BlogPost, payload["id"], options=[undefer(BlogPost.body_html)])
+        if p is None:
+            return  # deleted since; search.remove_post takes care of the document
+        search.index_post(db.session, p)
+        db.session.commit()
+
+@job_queue.task("search.remove_post")
+def remove_post_job(payload: dict):
+    with app.app_context():
+        search.remove_post(db.session, payload["id"], comment_ids=payload["comment_ids"])
+        db.session.commit()
+
+@job_queue.task("search.remove_comment")
+def remove_comment_job(payload: dict):
+    with app.app_context():
+        search.remove_comment(db.session, payload["id"])
+        db.session.commit()
+
+@job_queue.task("feed.recount_comments")
+def recount_comments_job(payload: dict):
+    # handlers adjust comment_count by +-1; this puts back the exact count if those drifted
+    pid = payload["post_id"]
+    with app.app_context():
+        exact = db.session.scalar(db.select(func.count(Comment.id)).where(Comment.post_id == pid))
+        result = db.session.execute(
+            db.update(FeedEntry).where(FeedEntry.id == pid, FeedEntry.comment_count != exact)
+            .values(comment_count=exact)
+        )
+        if result.rowcount:
+            bump_feed_version()
+        db.session.commit()
+        if result.rowcount:
+            app.logger.info("feed comment_count for post %s corrected to %s", pid, exact)
+            invalidate_cache("feed", post_tag(pid))
+
+@job_queue.task("contact.notify")
+def contact_notify_job(payload: dict):
+    to = app.config['CONTACT_NOTIFY_TO']
+    if not (app.config['SMTP_HOST'] and to):
+        app.logger.info("contact message from %s <%s> (SMTP not configured)", payload["name"], payload["email"])
+        return
+    msg = EmailMessage()
+    msg["Subject"] = f"Blog contact form: {payload['name']}"
+    msg["From"] = app.config['SMTP_FROM'] or to
+    msg["To"] = to
+    msg["Reply-To"] = payload["email"]
+    msg.set_content(f"From: {payload['name']} <{payload['email']}>\nDate: {payload['date']} UTC\n\n{payload['message']}")
+    # raising makes the queue retry with backoff
+    with smtplib.SMTP(app.config['SMTP_HOST'], app.config['SMTP_PORT'], timeout=10) as smtp:
+        smtp.starttls()
+        if app.config['SMTP_USER']:
+            smtp.login(app.config['SMTP_USER'], app.config['SMTP_PASSWORD'])
+        smtp.send_message(msg)
+
+if app.config['JOB_WORKERS'] > 0:
+    job_queue.start(app.config['JOB_WORKERS'])
+    atexit.register(job_queue.stop)  # lets running jobs finish; queued ones wait for the next worker
+
+rate_limiter = make_limiter(app.config['RATE_LIMIT_URL'], max_keys=app.config['RATE_LIMIT_MAX_KEYS'])
+rate_limits = {rule: parse_limit(spec) for rule, spec in app.config['RATE_LIMITS'].items()}
+rate_limit_rejections: dict[str, int] = {}
+request_metrics.register_gauge("rate_limit_rejections", lambda: dict(rate_limit_rejections))
+
+def check_rate_limit(rule: str, identity) -> None:
+    """Spend one token from `rule`'s bucket for `identity` (an IP, user id or email); raises RateLimited."""
+    limit = rate_limits.get(rule)
+    if limit is None:
+        return
+    retry_after = rate_limiter.hit(f"{rule}:{str(identity)[:254]}", limit)
+    if retry_after > 0:
+        rate_limit_rejections[rule] = rate_limit_rejections.get(rule, 0) + 1
+        raise RateLimited(rule, retry_after)
+
+if app.config['EVENTS_URL'].startswith("sqlite:///"):
+    os.makedirs(os.path.dirname(app.config['EVENTS_URL'][len("sqlite:///"):]) or ".", exist_ok=True)
+event_broker = make_broker(app.config['EVENTS_URL'], max_queue=app.config['SSE_QUEUE_SIZE'])
+request_metrics.register_gauge("sse", event_broker.stats)
+
+def publish_event(kind: str, data: dict, *channels: str):
+    """Push a delta to open SSE streams; call after the commit it describes."""
+    for channel in channels:
+        try:
+            event_broker.publish(channel, kind, data)
+        except Exception:
+            # live updates are best effort; the write itself already succeeded
+            app.logger.exception("could not publish %s on %s", kind, channel)
+
+@app.errorhandler(RateLimited)
+def rate_limited(e):
+    return (jsonify({"error": "Too many requests, please slow down", "retry_after": math.ceil(e.retry_after)}),
+            429, {"Retry-After": str(math.ceil(e.retry_after))})
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.get_or_404(User, user_id)
+    ident = identity_cache.get(str(user_id))
+    if ident is not None:
+        return ident
+    row = db.session.execute(
+        db.select(User.id, User.name, User.email, User.avatar_hash).where(User.id == int(user_id))
+    ).first()
+    if row is None:
+        abort(404)
+    return remember_identity(row)
 
 # Gravatar for comments
 gravatar = Gravatar(app, size=100, rating='g', default='retro',
@@ -148,77 +731,356 @@ def admin_only(f):
 
 ADMIN_EMAIL = (os.environ.get("ADMIN_EMAIL") or "").lower()
 
+def compute_is_admin(user_id: int, email: str | None) -> bool:
+    if user_id == 1:
+        return True
+    return bool(ADMIN_EMAIL and (email or "").lower() == ADMIN_EMAIL)
+
 def is_admin_user(u):
     if not u or not u.is_authenticated:
         return False
-    if u.id == 1:
-        return True
-    return ADMIN_EMAIL and u.email.lower() == ADMIN_EMAIL
+    # SessionUser already knows; ORM User objects (fresh logins) compute it
+    cached = getattr(u, "is_admin", None)
+    if cached is not None:
+        return cached
+    return compute_is_admin(u.id, u.email)
 
-def gravatar_url(email: str | None, size: int = 80, default: str = "retro") -> str:
-    if not email:
-        return f"https://www.gravatar.com/avatar/?d={default}&s={size}"
-    h = md5(email.strip().lower().encode("utf-8")).hexdigest()
-    return f"https://www.gravatar.com/avatar/{h}?d={default}&s={size}"
+response_cache = make_cache(
+    app.config['RESPONSE_CACHE_URL'],
+    max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+    ttl=app.config['RESPONSE_CACHE_TTL'],
+)
 
-def serialize_comment(c: Comment) -> dict:
-    name=c.comment_author.name if c.comment_author else "Anonymous"
-    return {
-        "id": c.id,
-        "text": c.text,
-        "author": name,
-        "author_name": c.comment_author.name if c.comment_author else "Anonymous",
-        "avatar": gravatar_url(getattr(c.comment_author, "email", None), 48),
-    }
+# Jinja {% cache %} fragments (see render_cache.py). Keys carry the content
+# version, so a per-worker LRU is enough: nothing needs invalidating.
+app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = int(os.environ.get("FRAGMENT_CACHE_MAX_ENTRIES", 2048))
+app.jinja_env.add_extension(FragmentCacheExtension)
+app.jinja_env.fragment_cache = LocalCache(max_entries=app.config['FRAGMENT_CACHE_MAX_ENTRIES'], ttl=3600)
 
-def serialize_post(p: BlogPost, with_body: bool = False, with_comments: bool = False) -> dict:
-    data = {
-        "id": p.id,
-        "title": p.title,
-        "subtitle": p.subtitle,
-        "date": p.date,
-        "img_url": p.img_url,
-        # keep if you later add a pinned column; harmless if absent:
-        "pinned": getattr(p, "pinned", False),
-    }
-    if with_body:
-        data["body"] = p.body
-    if with_comments:
-        data["comments"] = [serialize_comment(c) for c in p.comments]
-    return data
+request_metrics.register_gauge(
+    "response_cache_stats",
+    lambda: {k: v for k, v in response_cache.stats.as_dict().items() if k != "hit_ratio"},
+)
+
+def cache_key() -> str:
+    args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return f"{request.path}?{args}"
+
+def cached_response(tags):
+    """
+    Cache a GET view's 200 responses keyed on path + query args, plus the
+    ETag when conditional_get wraps the view (as in cached_page), so a write
+    seen by another worker can't pair a fresh ETag with an old body.
+    `tags(**view_kwargs)` names what the response depends on, so writes can
+    drop exactly those entries via invalidate_cache().
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = cache_key()
+            if g.get("etag"):
+                key = f"{key}:{g.etag}"
+            hit = response_cache.get(key)
+            if hit is not None:
+                head, body = hit.split(b"\n\n", 1)
+                status, mimetype = head.decode().split(" ", 1)
+                return app.response_class(body, status=int(status), mimetype=mimetype)
+            resp = app.make_response(f(*args, **kwargs))
+            if resp.status_code == 200:
+                packed = f"{resp.status_code} {resp.mimetype}".encode() + b"\n\n" + resp.get_data()
+                response_cache.set(key, packed, tuple(tags(**kwargs)))
+            return resp
+        return decorated_function
+    return decorator
+
+def conditional_get(stamp):
+    """
+    Strong ETag / Last-Modified for a GET view. `stamp(**view_kwargs)` returns
+    (etag, last_modified) from cheap version columns, or None for a 404.
+    A matching If-None-Match (or If-Modified-Since) gets a 304 before the
+    view, the response cache or any serialization runs.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            stamped = stamp(**kwargs)
+            if stamped is None:
+                abort(404)
+            etag, last_modified = stamped
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0)
+            not_modified = (
+                request.if_none_match.contains(etag) if request.if_none_match
+                else last_modified is not None and request.if_modified_since is not None
+                and last_modified <= request.if_modified_since.replace(tzinfo=None)
+            )
+            if not_modified:
+                resp = app.response_class(status=304)
+            else:
+                g.etag = etag
+                resp = app.make_response(f(*args, **kwargs))
+            resp.set_etag(etag)
+            if last_modified is not None:
+                resp.last_modified = last_modified
+            # let browsers keep the body but always revalidate
+            resp.cache_control.no_cache = True
+            return resp
+        return decorated_function
+    return decorator
+
+# stands in for the per-session CSRF token inside cached pages
+CSRF_PLACEHOLDER = b"__csrf_token_placeholder__"
 
+def cached_page(stamp, tags):
+    """
+    Whole-page cache for anonymous GETs of a Jinja view. The key is the path +
+    query args + the content version from `stamp(**view_kwargs)` (as in
+    conditional_get), so a write in one worker can't leave another worker
+    serving an old page; `tags` lets the same invalidate_cache() calls as
+    the API drop entries early. Logged-in users (navbar, admin buttons),
+    POSTs and requests with pending flash messages always render.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != "GET" or current_user.is_authenticated or session.get("_flashes"):
+                return f(*args, **kwargs)
+            stamped = stamp(**kwargs)
+            if stamped is None:
+                abort(404)
+            key = f"page:anon:{cache_key()}:{stamped[0]}"
+            hit = response_cache.get(key)
+            if hit is not None:
+                return app.response_class(hit.replace(CSRF_PLACEHOLDER, generate_csrf().encode()),
+                                          mimetype="text/html")
+            resp = app.make_response(f(*args, **kwargs))
+            if resp.status_code == 200 and resp.mimetype == "text/html":
+                body = resp.get_data()
+                token = g.get("csrf_token")
+                if token:
+                    body = body.replace(token.encode(), CSRF_PLACEHOLDER)
+                response_cache.set(key, body, tuple(tags(**kwargs)))
+            return resp
+        return decorated_function
+    return decorator
+
+def static_page_stamp():
+    return "static", None
+
+def feed_stamp():
+    row = db.session.execute(db.select(FeedVersion.version, FeedVersion.updated_at)).first()
+    if row is None:
+        return "feed-0", None
+    return f"feed-{row.version}", row.updated_at
+
+def post_stamp(pid: int):
+    row = db.session.execute(
+        db.select(BlogPost.version, BlogPost.updated_at).where(BlogPost.id == pid)
+    ).first()
+    if row is None:
+        return None
+    return f"post-{pid}-{row.version}", row.updated_at
+
+def invalidate_cache(*tags: str):
+    response_cache.invalidate(*tags)
+
+def post_tag(pid: int) -> str:
+    return f"post:{pid}"
+
+@lru_cache(maxsize=4096)
+def gravatar_hash(email: str) -> str:
+    return md5(email.strip().lower().encode("utf-8")).hexdigest()
+
+def avatar_url(user, size: int = 80) -> str:
+    """Avatar for a User/SessionUser (or None) from the stored hash; no per-call md5."""
+    digest = getattr(user, "avatar_hash", None)
+    if digest is None and getattr(user, "email", None):
+        digest = gravatar_hash(user.email)  # row not backfilled yet
+    if app.config['AVATAR_PROXY']:
+        return f"/api/avatar/{digest or 'default'}?s={avatar_size(size)}"
+    return f"https://www.gravatar.com/avatar/{digest or ''}?d=retro&s={size}"
+
+@app.template_filter("avatar")
+def avatar_filter(user, size: int = 100) -> str:
+    # templates: {{ comment.comment_author | avatar(48) }} instead of email | gravatar
+    return avatar_url(user, size)
+
+def post_body(row) -> str:
+    # sanitized at write time; rows that predate backfill_content are sanitized here
+    if row.body_html is not None:
+        return row.body_html
+    return sanitize_html(db.session.scalar(db.select(BlogPost.body).where(BlogPost.id == row.id)))
+
+# Response schemas (see serializers.py). Views select the listed columns and
+# dump rows straight from them; ?fields= picks a subset.
+FEED_ITEM = Schema(
+    id=Field("id", [FeedEntry.id]),
+    title=Field("title", [FeedEntry.title]),
+    subtitle=Field("subtitle", [FeedEntry.subtitle]),
+    date=Field("date", [FeedEntry.date]),
+    img_url=Field("img_url", [FeedEntry.img_url]),
+    author=Field("author_name", [FeedEntry.author_name]),
+    pinned=Field("pinned", [FeedEntry.pinned], convert=bool),
+    comment_count=Field("comment_count", [FeedEntry.comment_count]),
+    excerpt=Field("excerpt", [FeedEntry.excerpt]),
+    reading_minutes=Field("reading_minutes", [FeedEntry.reading_minutes]),
+)
+feed_item = FEED_ITEM.dumper()  # for a single FeedEntry, e.g. SSE payloads
+
+POST = Schema(
+    id=Field("id", [BlogPost.id]),
+    title=Field("title", [BlogPost.title]),
+    subtitle=Field("subtitle", [BlogPost.subtitle]),
+    date=Field("date", [BlogPost.date]),
+    img_url=Field("img_url", [BlogPost.img_url]),
+    pinned=Field("pinned", [BlogPost.pinned], convert=bool),
+    author=Field("author", [User.name.label("author")]),
+    author_id=Field("author_id", [BlogPost.author_id]),
+    body=Field(post_body, [BlogPost.body_html]),
+    reading_minutes=Field("reading_minutes", [BlogPost.reading_minutes]),
+    comments=Field(lambda r: None),  # filled in by api_post from its own query
+)
+
+COMMENT = Schema(
+    id=Field("id", [Comment.id]),
+    text=Field("text", [Comment.text]),
+    author_name=Field("author_name", [User.name.label("author_name")], convert=lambda name: name or "Anonymous"),
+    avatar=Field(lambda r: avatar_url(r, 48), [User.avatar_hash, User.email]),
+)
+
+def serialize_comment(c: Comment) -> dict:
+    """COMMENT for an ORM Comment (write paths that already hold one)."""
+    author = c.comment_author
+    return COMMENT.dump(SimpleNamespace(
+        id=c.id, text=c.text, author_name=author.name if author else None,
+        avatar_hash=getattr(author, "avatar_hash", None), email=getattr(author, "email", None),
+    ))
+
+@app.errorhandler(UnknownFields)
+def unknown_fields(e):
+    return jsonify({"error": str(e)}), 400
 
 # -----------------------------
 # CSRF Token for SPA (React)
 # -----------------------------
 @app.get("/api/csrf-token")
 def csrf_token():
-    from flask_wtf.csrf import generate_csrf
     token = generate_csrf()
     resp = app.make_response({"ok": True})
+    set_csrf_cookie(resp, token)
+    return resp
+
+def set_csrf_cookie(resp, token: str):
     # SameSite/secure must match your deployment shape (see SESSION_COOKIE_* above)
     resp.set_cookie("csrf_token", token, samesite=app.config["SESSION_COOKIE_SAMESITE"],
                     secure=app.config["SESSION_COOKIE_SECURE"])
-    return resp
 
 # -----------------------------
 # JSON API Endpoints (for React)
 # -----------------------------
+FEED_PAGE_SIZE = 20
+FEED_PAGE_MAX = 100
+
+def encode_feed_cursor(p: FeedEntry) -> str:
+    return f"{int(bool(p.pinned))}:{p.id}"
+
+def decode_feed_cursor(raw: str) -> tuple[bool, int] | None:
+    try:
+        pinned, pid = raw.split(":", 1)
+        return pinned == "1", int(pid)
+    except ValueError:
+        return None
+
 @app.get("/api/posts")
+@conditional_get(lambda: feed_stamp())
+@cached_response(lambda: ("feed",))
 def api_posts():
-    result = db.session.execute(db.select(BlogPost).order_by(BlogPost.pinned.desc(),BlogPost.id.desc()))
-    posts = result.scalars().all()
-    return jsonify([{
-        "id": p.id, "title": p.title, "subtitle": p.subtitle,
-        "date": p.date, "img_url": p.img_url,
-        "author": p.author.name if p.author else None,
-        "pinned": bool(p.pinned),
-    } for p in posts])
+    # served from the feed projection: one single-table query per page, no body, no joins
+    fields = FEED_ITEM.parse(request.args.get("fields"))
+
+    # Legacy shape (plain list of every post) when no paging args are given
+    if "limit" not in request.args and "cursor" not in request.args:
+        columns = FEED_ITEM.columns(fields)
+        rows = db.session.execute(
+            db.select(*columns).order_by(FeedEntry.pinned.desc(), FeedEntry.id.desc())
+        ).all()
+        return jsonify(FEED_ITEM.dump_many(rows, fields, columns))
+
+    limit = request.args.get("limit", FEED_PAGE_SIZE, type=int)
+    page = feed_page(limit, request.args.get("cursor"), fields)
+    if page is None:
+        return jsonify({"error": "Invalid cursor"}), 400
+    return jsonify(page)
+
+def feed_page(limit: int, cursor: str | None, fields: tuple[str, ...] | None = None) -> dict | None:
+    """One keyset page of the feed as {posts, next_cursor}; None for a bad cursor."""
+    fields = fields or tuple(FEED_ITEM.fields)
+    # the cursor is built from (pinned, id), so those are read even when not returned
+    columns = FEED_ITEM.columns(fields, FeedEntry.id, FeedEntry.pinned)
+    stmt = db.select(*columns).order_by(FeedEntry.pinned.desc(), FeedEntry.id.desc())
+    limit = max(1, min(limit, FEED_PAGE_MAX))
+    if cursor:
+        decoded = decode_feed_cursor(cursor)
+        if decoded is None:
+            return None
+        c_pinned, c_id = decoded
+        # rows strictly after (c_pinned, c_id) in (pinned DESC, id DESC) order
+        after = and_(FeedEntry.pinned.is_(c_pinned), FeedEntry.id < c_id)
+        if c_pinned:
+            after = or_(FeedEntry.pinned.is_(False), after)
+        stmt = stmt.where(after)
+
+    # fetch one extra row to know whether another page exists
+    posts = db.session.execute(stmt.limit(limit + 1)).all()
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+    return {
+        "posts": FEED_ITEM.dump_many(posts, fields, columns),
+        "next_cursor": encode_feed_cursor(posts[-1]) if has_more else None,
+    }
+
+COMMENTS_PAGE_MAX = 200
 
 @app.get("/api/posts/<int:pid>")
+@conditional_get(lambda pid: post_stamp(pid))
+@cached_response(lambda pid: (post_tag(pid),))
 def api_post(pid):
-    p = db.get_or_404(BlogPost, pid)
-    return jsonify(serialize_post(p, with_body=True, with_comments=True))
+    # ?fields=id,title,comments and ?comment_fields=id,text narrow the payload (and the SELECTs)
+    fields = POST.parse(request.args.get("fields"))
+    comment_fields = COMMENT.parse(request.args.get("comment_fields"))
+    post_fields = tuple(f for f in fields if f != "comments")
+    columns = POST.columns(post_fields, BlogPost.id)
+    p = db.session.execute(
+        db.select(*columns).outerjoin(User, User.id == BlogPost.author_id).where(BlogPost.id == pid)
+    ).first()
+    if p is None:
+        abort(404)
+    data = POST.dump(p, post_fields, columns)
+    if "comments" not in fields:
+        return jsonify(data)
+
+    # comments + their authors in one query, oldest first, as plain rows
+    columns = COMMENT.columns(comment_fields, Comment.id)
+    stmt = (db.select(*columns)
+            .outerjoin(User, User.id == Comment.author_id)
+            .where(Comment.post_id == pid)
+            .order_by(Comment.id))
+    after = request.args.get("comments_after", type=int)
+    if after is not None:
+        stmt = stmt.where(Comment.id > after)
+    limit = request.args.get("comments_limit", type=int)
+    if limit is not None:
+        limit = max(1, min(limit, COMMENTS_PAGE_MAX))
+        stmt = stmt.limit(limit + 1)
+    comments = db.session.execute(stmt).all()
+
+    has_more = limit is not None and len(comments) > limit
+    if has_more:
+        comments = comments[:limit]
+    data["comments"] = COMMENT.dump_many(comments, comment_fields, columns)
+    if limit is not None or after is not None:
+        data["next_comments_after"] = comments[-1].id if has_more else None
+    return jsonify(data)
 #({
 #        "id": p.id, "title": p.title, "subtitle": p.subtitle,
 #        "date": p.date, "img_url": p.img_url, "body": p.body,
@@ -238,15 +1100,23 @@ def api_pin_post(pid):
         p.pinned = bool(data["pinned"])
     else:
         p.pinned = not bool(p.pinned)
+    sync_feed_entry(p)
     db.session.commit()
+    invalidate_cache("feed", post_tag(pid))
+    publish_event("post.pinned", {"id": pid, "pinned": bool(p.pinned)}, "feed", post_tag(pid))
     return {"ok": True, "pinned": bool(p.pinned)}
 
 @app.delete("/api/posts/<int:pid>")
 @admin_only
 def api_delete_post(pid):
     p = db.get_or_404(BlogPost, pid)
+    comment_ids = search.comment_ids_for(db.session, pid)  # gone once the delete cascades
+    drop_feed_entry(pid)
     db.session.delete(p)
     db.session.commit()
+    invalidate_cache("feed", post_tag(pid))
+    enqueue_job("search.remove_post", {"id": pid, "comment_ids": comment_ids})
+    publish_event("post.deleted", {"id": pid}, "feed", post_tag(pid))
     return {"ok": True}
 
 @app.delete("/api/comments/<int:cid>")
@@ -258,24 +1128,47 @@ def api_delete_comment(cid):
     if not (is_admin_user(current_user) or c.parent_post.author_id == current_user.id):
         return {"error": "Forbidden"}, 403
 
+    post_id = c.post_id
+    bump_feed_comments(post_id, -1)
     db.session.delete(c)
     db.session.commit()
+    invalidate_cache("feed", post_tag(post_id))
+    enqueue_job("search.remove_comment", {"id": cid})
+    enqueue_job("feed.recount_comments", {"post_id": post_id}, dedupe_key=f"recount:{post_id}")
+    publish_event("comment.deleted", {"id": cid, "post_id": post_id}, post_tag(post_id))
+    publish_event("post.comments", {"id": post_id, "delta": -1}, "feed")
     return {"ok": True}
 
 @app.post("/api/posts/<int:pid>/comments")
 @login_required
 def api_add_comment(pid):
+    check_rate_limit("comment_user", current_user.id)
+    check_rate_limit("comment_ip", request.remote_addr)
     post = db.get_or_404(BlogPost, pid)
     data = request.get_json() or {}
     text = (data.get("text") or "").strip()
     if not text:
         return {"message":"Comment text required"}, 400
-    comment = Comment(text=text, comment_author=current_user, parent_post=post)
-    db.session.add(comment); db.session.commit()
-    return jsonify(serialize_comment(comment)),201
+    if write_queue is not None and app.config['WRITE_BEHIND_COMMENTS']:
+        write_queue.put("comment", {"text": text, "author_id": current_user.id, "post_id": pid})
+        name = current_user.name
+        # no id until the queue flushes it
+        return jsonify({"id": None, "text": text, "author_name": name,
+                        "avatar": avatar_url(current_user, 48), "pending": True}), 202
+    comment = Comment(text=text, author_id=current_user.id, parent_post=post)
+    db.session.add(comment); db.session.flush()
+    search.index_comment(db.session, comment)
+    bump_feed_comments(pid, 1)
+    db.session.commit()
+    invalidate_cache("feed", post_tag(pid))
+    data = serialize_comment(comment)
+    publish_event("comment.added", {"post_id": pid, **data}, post_tag(pid))
+    publish_event("post.comments", {"id": pid, "delta": 1}, "feed")
+    return jsonify(data),201
 
 @app.post("/api/register")
 def api_register():
+    check_rate_limit("register_ip", request.remote_addr)
     data = request.get_json() or {}
     email = (data.get("email") or "").lower().strip()
     name = (data.get("name") or "").strip()
@@ -284,10 +1177,12 @@ def api_register():
         return jsonify({"error": "Missing fields"}), 400
     if db.session.execute(db.select(User).where(User.email == email)).scalar():
         return jsonify({"error": "Email already registered"}), 400
-    hashed = generate_password_hash(password, method='pbkdf2:sha256', salt_length=8)
+    hashed = hasher.hash(password)
     user = User(email=email, name=name, password=hashed)
     db.session.add(user); db.session.commit()
+    invalidate_cache("admin")  # the first account becomes the admin
     login_user(user)
+    remember_identity(user)  # replaces anything cached under a recycled id
     return jsonify({"ok": True})
 
 @app.post("/api/login")
@@ -295,15 +1190,20 @@ def api_login():
     data = request.get_json() or {}
     email = (data.get("email") or "").lower().strip()
     password = data.get("password") or ""
+    check_rate_limit("login_ip", request.remote_addr)
+    check_rate_limit("login_account", email)
 
     user = db.session.execute(db.select(User).where(User.email == email)).scalar()
-    if not user or not check_password_hash(user.password, password):
+    if not user or not check_user_password(user, password):
         return jsonify({"error": "Invalid credentials"}), 401
     login_user(user)
+    remember_identity(user)
     return jsonify({"ok": True})
 
 @app.post("/api/logout")
 def api_logout():
+    if current_user.is_authenticated:
+        forget_identity(current_user.id)
     logout_user()
     return jsonify({"ok": True})
 
@@ -316,27 +1216,36 @@ def api_create_post():
         return jsonify({"error": "Missing fields"}), 400
     p = BlogPost(
         title=data["title"], subtitle=data["subtitle"], body=data["body"],
-        img_url=data["img_url"], author=current_user,
+        img_url=data["img_url"], author_id=current_user.id,
         date=date.today().strftime("%B %d, %Y")
     )
-    db.session.add(p); db.session.commit()
-    return jsonify({"id": p.id})
+    db.session.add(p); db.session.flush()
+    item = feed_item(sync_feed_entry(p, author_name=current_user.name))
+    db.session.commit()
+    invalidate_cache("feed")
+    enqueue_job("search.index_post", {"id": item["id"]}, dedupe_key=f"index:{item['id']}")
+    publish_event("post.created", item, "feed")
+    return jsonify({"id": item["id"]})
 
 @app.post("/api/contact")
 def api_contact():
+    check_rate_limit("contact_ip", request.remote_addr)
     data = request.get_json() or {}
     name = (data.get("name") or "").strip()
     email = (data.get("email") or "").strip()
     message = (data.get("message") or "").strip()
     if not (name and email and message):
         return {"error":"All fields required"}, 400
-    cm = ContactMessage(
-        name=name, email=email, message=message,
-        date=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    )
+    row = dict(name=name, email=email, message=message,
+               date=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"))
+    if write_queue is not None:
+        write_queue.put("contact", row)
+        enqueue_job("contact.notify", row)
+        return {"ok": True, "queued": True}, 202
+    cm = ContactMessage(**row)
     db.session.add(cm)
     db.session.commit()
-    # you can also email here later
+    enqueue_job("contact.notify", row)
     return {"ok": True}
 
 @app.get("/api/whoami")
@@ -352,29 +1261,399 @@ def whoami():
     }
 @app.get("/api/me")
 def api_me():
+    return jsonify(me_payload())
+
+def me_payload() -> dict:
     if current_user.is_authenticated:
-        return jsonify({
+        return {
             "authenticated": True,
             "id": current_user.id,
             "name": current_user.name,
             "email": current_user.email,
-            "is_admin": (current_user.id == 1),
-            "avatar": gravatar_url(current_user.email, 64)
-        })
-    return jsonify({"authenticated": False})
+            "is_admin": is_admin_user(current_user),
+            "avatar": avatar_url(current_user, 64)
+        }
+    return {"authenticated": False}
 
 @app.get("/api/admin")
+@cached_response(lambda: ("admin",))
 def api_admin():
-    admin = db.session.get(User, 1)
+    return jsonify(admin_payload())
+
+def admin_payload() -> dict:
+    # the signed-in admin already has everything we need; no query
+    admin = current_user if current_user.is_authenticated and current_user.id == 1 else db.session.get(User, 1)
     if not admin:
-        return jsonify({})
-    return jsonify({
+        return {}
+    return {
         "id": admin.id,
         "name": admin.name,
         "email": admin.email,
-        "avatar": gravatar_url(admin.email, 64)
+        "avatar": avatar_url(admin, 64)
+    }
+
+def cached_json(key: str, tags: tuple[str, ...], build):
+    """build() through response_cache, for the shared parts of /api/bootstrap."""
+    hit = response_cache.get(key)
+    if hit is not None:
+        return app.json.loads(hit)
+    value = build()
+    response_cache.set(key, app.json.dumps(value).encode(), tags)
+    return value
+
+@app.get("/api/bootstrap")
+def api_bootstrap():
+    """
+    Everything the SPA needs on first load in one round trip: CSRF token
+    (also set as the csrf_token cookie), current user, admin info and the
+    first feed page. Replaces /api/csrf-token + /api/me + /api/admin +
+    /api/posts. The user comes from the identity cache, and admin info and
+    the feed page from response_cache (tags "admin" / "feed"). The feed key
+    carries the feed version, as cached_response does with the ETag, so a
+    write seen by another worker can't leave this one serving an old page.
+    A warm call runs just that version lookup.
+    """
+    limit = max(1, min(request.args.get("limit", FEED_PAGE_SIZE, type=int), FEED_PAGE_MAX))
+    token = generate_csrf()
+    me = me_payload()
+    admin = admin_payload() if me.get("id") == 1 else cached_json("bootstrap:admin", ("admin",), admin_payload)
+    feed = cached_json(f"bootstrap:feed:{limit}:{feed_stamp()[0]}", ("feed",), lambda: feed_page(limit, None))
+    resp = jsonify({"csrf_token": token, "me": me, "admin": admin, "feed": feed})
+    set_csrf_cookie(resp, token)
+    resp.cache_control.no_store = True  # carries a per-session token
+    return resp
+
+BATCH_MAX_REQUESTS = 10
+# request headers a sub-request inherits (identity, content negotiation, proxy info)
+BATCH_FORWARDED_HEADERS = {"cookie", "authorization", "accept", "accept-language", "user-agent",
+                           "x-forwarded-for", "x-forwarded-proto", "x-forwarded-host"}
+# streaming endpoints: a batch would buffer them, holding this thread until the stream ends
+BATCH_EXCLUDED = re.compile(r"^/api/(events|posts/\d+/events|admin/export)/?$")
+
+def run_subrequest(path: str) -> tuple[dict, list[str]]:
+    """Dispatch a GET for `path` in-process, as the current user. -> (result, Set-Cookie headers)."""
+    url = urlsplit(path)
+    if not url.path.startswith("/api/") or url.path.rstrip("/") == "/api/batch" or url.scheme or url.netloc:
+        return {"path": path, "status": 400, "body": {"error": "Only /api/ GET paths can be batched"}}, []
+    if BATCH_EXCLUDED.match(url.path):
+        return {"path": path, "status": 400, "body": {"error": "Streaming endpoints can't be batched"}}, []
+    builder = EnvironBuilder(
+        path=url.path, query_string=url.query, method="GET", base_url=request.host_url,
+        headers=[(k, v) for k, v in request.headers if k.lower() in BATCH_FORWARDED_HEADERS],
+        environ_base={"REMOTE_ADDR": request.remote_addr},
+    )
+    # a fresh app context too, so g (metrics, login cache) and the DB session are per sub-request
+    with app.app_context(), app.request_context(builder.get_environ()):
+        try:
+            resp = app.full_dispatch_request()
+        except Exception:
+            app.logger.exception("batched request %s failed", path)
+            return {"path": path, "status": 500, "body": {"error": "Internal error"}}, []
+        if resp.is_streamed:
+            resp.close()
+            return {"path": path, "status": 400, "body": {"error": "Streaming endpoints can't be batched"}}, []
+        body = resp.get_json(silent=True) if resp.is_json else resp.get_data(as_text=True)
+        return {"path": path, "status": resp.status_code, "body": body}, resp.headers.getlist("Set-Cookie")
+
+@app.post("/api/batch")
+@csrf.exempt  # sub-requests are GETs only, so there is nothing to forge
+def api_batch():
+    """
+    {"requests": ["/api/me", "/api/posts?limit=5", ...]} (or [{"path": ...}])
+    -> {"responses": [{"path", "status", "body"}, ...]} in the same order.
+    Each sub-request runs through the normal routing, hooks and caches.
+    """
+    data = request.get_json(silent=True) or {}
+    paths = [r.get("path") if isinstance(r, dict) else r for r in data.get("requests") or []]
+    if not paths or not all(isinstance(p, str) for p in paths):
+        return jsonify({"error": "requests must be a list of paths"}), 400
+    if len(paths) > BATCH_MAX_REQUESTS:
+        return jsonify({"error": f"At most {BATCH_MAX_REQUESTS} requests per batch"}), 400
+    results, cookies = [], []
+    for path in paths:
+        result, set_cookies = run_subrequest(path)
+        results.append(result)
+        cookies.extend(set_cookies)
+    resp = jsonify({"responses": results})
+    for cookie in cookies:
+        resp.headers.add("Set-Cookie", cookie)
+    return resp
+
+AVATAR_SIZES = (32, 48, 64, 80, 100, 128)
+avatar_cache = LocalCache(max_entries=2048, ttl=app.config['AVATAR_CACHE_TTL'],
+                          max_bytes=app.config['AVATAR_CACHE_MAX_BYTES'], weigh=lambda hit: len(hit[1]))
+
+def avatar_size(size: int) -> int:
+    # a few fixed sizes keep the proxy cache small
+    return min(AVATAR_SIZES, key=lambda s: abs(s - size))
+
+@app.get("/api/avatar/<digest>")
+def api_avatar(digest):
+    if digest != "default" and not re.fullmatch(r"[0-9a-f]{32}", digest):
+        abort(404)
+    size = avatar_size(request.args.get("s", 80, type=int))
+    upstream = f"https://www.gravatar.com/avatar/{'' if digest == 'default' else digest}?d=retro&s={size}"
+    key = f"{digest}:{size}"
+    hit = avatar_cache.get(key)
+    if hit is None:
+        try:
+            # only misses reach gravatar, so only they are throttled; over the
+            # limit the browser is sent to gravatar instead of us fetching for it
+            check_rate_limit("avatar_ip", request.remote_addr)
+        except RateLimited:
+            return redirect(upstream)
+        try:
+            with urlopen(upstream, timeout=3) as r:
+                hit = (r.headers.get_content_type(), r.read(256 * 1024))
+        except OSError:
+            return redirect(upstream)
+        avatar_cache.set(key, hit)
+    resp = app.response_class(hit[1], mimetype=hit[0])
+    resp.cache_control.public = True
+    resp.cache_control.max_age = int(app.config['AVATAR_CACHE_TTL'])
+    return resp
+
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"
+
+def event_stream(channels: tuple[str, ...]):
+    """
+    text/event-stream of the deltas published on `channels`. Reconnects send
+    Last-Event-ID and get what they missed, or a "resync" event (refetch)
+    when it is gone. Streams end after SSE_MAX_SECONDS, and the browser
+    reconnects, so a gthread worker gets its threads back.
+    """
+    if event_broker.connections >= app.config['SSE_MAX_CONNECTIONS']:
+        return jsonify({"error": "Too many live connections, please retry"}), 503, {"Retry-After": "10"}
+    raw_last = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    last_id = int(raw_last) if raw_last and raw_last.isdigit() else None
+    sub, replay = event_broker.subscribe(channels, last_id)
+    heartbeat = app.config['SSE_HEARTBEAT']
+    deadline = time.monotonic() + app.config['SSE_MAX_SECONDS']
+
+    # no request or app context in here: the stream must not pin a DB connection
+    def generate():
+        try:
+            yield b"retry: 3000\n\n"
+            if replay is None:
+                yield RESYNC_FRAME
+            elif replay:
+                yield b"".join(e.frame for e in replay)
+            while time.monotonic() < deadline:
+                events = sub.wait(heartbeat)
+                if sub.overflowed:
+                    yield RESYNC_FRAME  # fell too far behind; the client refetches and reconnects
+                    return
+                if not events:
+                    yield b": ping\n\n"  # keeps proxies from closing an idle stream
+                    continue
+                for e in events:
+                    event_broker.record_latency(e)
+                yield b"".join(e.frame for e in events)
+        finally:
+            event_broker.unsubscribe(sub)
+
+    return app.response_class(generate(), mimetype="text/event-stream",
+                              headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
+
+@app.get("/api/events")
+def api_feed_events():
+    # post.created / post.updated / post.deleted / post.pinned / post.comments (count deltas)
+    return event_stream(("feed",))
+
+@app.get("/api/posts/<int:pid>/events")
+def api_post_events(pid):
+    # comment.added / comment.deleted / post.pinned / post.updated / post.deleted for one post
+    if post_stamp(pid) is None:
+        abort(404)
+    return event_stream((post_tag(pid),))
+
+@app.get("/api/events/stats")
+@admin_only
+def api_event_stats():
+    # per worker process, like the other stats endpoints
+    return jsonify({"backend": event_broker.name, **event_broker.stats()})
+
+SEARCH_PAGE_SIZE = 10
+SEARCH_PAGE_MAX = 50
+
+@app.get("/api/search")
+def api_search():
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "Query required"}), 400
+    if not search.is_supported(db.session):
+        return jsonify({"error": "Search is not available on this database"}), 501
+    limit = max(1, min(request.args.get("limit", SEARCH_PAGE_SIZE, type=int), SEARCH_PAGE_MAX))
+    offset = max(0, request.args.get("offset", 0, type=int))
+    hits = search.search(db.session, q, limit + 1, offset)
+    return jsonify({
+        "results": hits[:limit],
+        "next_offset": offset + limit if len(hits) > limit else None,
+    })
+
+@app.get("/api/_metrics")
+def api_metrics():
+    token = app.config['METRICS_TOKEN']
+    bearer = request.headers.get("Authorization", "")
+    if not ((token and bearer == f"Bearer {token}") or is_admin_user(current_user)):
+        abort(403)
+    return app.response_class(request_metrics.render_prometheus(),
+                              mimetype="text/plain; version=0.0.4")
+
+@app.get("/api/cache/stats")
+@admin_only
+def api_cache_stats():
+    # counters are per worker process for the memory backend
+    return jsonify({
+        "backend": response_cache.name,
+        "entries": response_cache.size(),
+        **response_cache.stats.as_dict(),
     })
 
+@app.get("/api/write-queue/stats")
+@admin_only
+def api_write_queue_stats():
+    if write_queue is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **write_queue.stats()})
+
+@app.get("/api/jobs/stats")
+@admin_only
+def api_job_stats():
+    return jsonify(job_queue.stats())
+
+@app.get("/api/admin/export")
+@admin_only
+def api_export():
+    # streamed straight from a server-side cursor; ?passwords=1 includes hashes for a full backup
+    lines = bulk.export_ndjson(db.session, User, BlogPost, Comment,
+                               include_passwords=request.args.get("passwords") == "1")
+    return app.response_class(stream_with_context(lines), mimetype="application/x-ndjson",
+                              headers={"Content-Disposition": "attachment; filename=blog-export.ndjson"})
+
+@app.post("/api/admin/import")
+@admin_only
+def api_import():
+    on_conflict = request.args.get("on_conflict", "skip")
+    if on_conflict not in ("skip", "update"):
+        return jsonify({"error": "on_conflict must be skip or update"}), 400
+    # request.stream yields the body line by line without buffering it
+    stats = bulk.import_ndjson(db.session, request.stream, User, BlogPost, Comment,
+                               on_conflict=on_conflict, default_author_id=current_user.id)
+    after_bulk_import(stats)
+    return jsonify(stats)
+
+def after_bulk_import(stats: dict):
+    backfill_avatar_hashes()
+    rebuild_feed()
+    invalidate_cache("feed", *(post_tag(pid) for pid in stats.pop("updated_post_ids")))
+    publish_event("resync", {}, "feed")  # too many changes to stream one by one
+
+# -----------------------------
+# CLI
+# -----------------------------
+@app.cli.command("search-rebuild")
+def search_rebuild():
+    """Rebuild the full-text search index from existing posts and comments."""
+    n = search.rebuild(db.session, BlogPost, Comment)
+    print(f"Indexed {n} documents.")
+
+@app.cli.command("feed-rebuild")
+def feed_rebuild():
+    """Recompute the denormalized home-feed table from posts and comments."""
+    rebuild_feed()
+    print(f"Feed has {db.session.query(FeedEntry).count()} entries.")
+
+@app.cli.command("export-ndjson")
+@click.argument("path", default="-")
+@click.option("--with-passwords", is_flag=True, help="Include password hashes (full backup).")
+def export_ndjson_command(path, with_passwords):
+    """Stream users, posts and comments as NDJSON to PATH (default stdout)."""
+    out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+    started, rows = datetime.now(), 0
+    try:
+        for chunk in bulk.export_ndjson(db.session, User, BlogPost, Comment, include_passwords=with_passwords):
+            out.write(chunk)
+            rows += chunk.count("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"Exported {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s).", file=sys.stderr)
+
+@app.cli.command("import-ndjson")
+@click.argument("path")
+@click.option("--on-conflict", type=click.Choice(["skip", "update"]), default="skip",
+              help="What to do with posts whose title already exists.")
+@click.option("--author-id", type=int, default=1, help="Author for rows whose author isn't in the file.")
+@click.option("--batch-size", type=int, default=bulk.IMPORT_BATCH)
+def import_ndjson_command(path, on_conflict, author_id, batch_size):
+    """Load an NDJSON export (PATH or - for stdin) in batched transactions."""
+    src = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        stats = bulk.import_ndjson(db.session, src, User, BlogPost, Comment, on_conflict=on_conflict,
+                                   default_author_id=author_id, batch_size=batch_size)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+    after_bulk_import(stats)
+    for sample in stats.pop("error_samples"):
+        print(sample, file=sys.stderr)
+    print(json.dumps(stats))
+
+@app.cli.command("content-backfill")
+@click.option("--batch-size", type=int, default=500)
+def content_backfill(batch_size):
+    """Sanitize and pre-render post bodies and comments that have no stored HTML yet."""
+    posts, comments = backfill_content(batch_size)
+    print(f"Rendered {posts} posts and {comments} comments.")
+
+@app.cli.command("avatar-backfill")
+def avatar_backfill():
+    """Store avatar hashes for users that don't have one (e.g. after a bulk import)."""
+    print(f"Backfilled {backfill_avatar_hashes()} users.")
+
+@app.cli.command("jobs-worker")
+@click.option("--threads", type=int, default=4)
+def jobs_worker(threads):
+    """Run background jobs in this process until SIGINT/SIGTERM."""
+    job_queue.stop()  # replace the in-process pool (JOB_WORKERS) with one of the requested size
+    job_queue.start(threads)
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    print(f"Running jobs from {app.config['JOBS_PATH']} on {threads} threads.")
+    try:
+        while not stopping:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    job_queue.stop(timeout=60)  # let running jobs finish
+
+@app.cli.command("jobs-status")
+def jobs_status():
+    print(json.dumps(job_queue.stats(), indent=2))
+
+@app.cli.command("jobs-requeue")
+@click.option("--name", default=None, help="Only jobs with this name.")
+def jobs_requeue(name):
+    """Give jobs that exhausted their retries another round."""
+    print(f"Requeued {job_queue.requeue_dead(name)} dead jobs.")
+
+@app.cli.command("db-upgrade")
+def db_upgrade():
+    """Apply pending schema migrations."""
+    applied = migrations.upgrade(db.engine)
+    print(f"Applied {applied or 'nothing'}; schema at version {migrations.current_version(db.engine)}.")
+
+@app.cli.command("db-status")
+def db_status():
+    """Show the database schema version and pending migrations."""
+    current = migrations.current_version(db.engine)
+    print(f"Schema version {current} (latest {migrations.latest_version()}).")
+    for version, name, _ in migrations.MIGRATIONS:
+        if version > current:
+            print(f"  pending {version}: {name}")
+
 # -----------------------------
 # Existing Server-Rendered Routes (Jinja)
 # -----------------------------
@@ -382,14 +1661,13 @@ def api_admin():
 def register():
     form = RegisterForm()
     if form.validate_on_submit():
+        check_rate_limit("register_ip", request.remote_addr)
         result = db.session.execute(db.select(User).where(User.email == form.email.data))
         user = result.scalar()
         if user:
             flash("You've already signed up with that email, log in instead!")
             return redirect(url_for('login'))
-        hash_and_salted_password = generate_password_hash(
-            form.password.data, method='pbkdf2:sha256', salt_length=8
-        )
+        hash_and_salted_password = hasher.hash(form.password.data)
         new_user = User(
             email=form.email.data.lower().strip(),
             name=form.name.data.strip(),
@@ -397,7 +1675,9 @@ def register():
         )
         db.session.add(new_user)
         db.session.commit()
+        invalidate_cache("admin")
         login_user(new_user)
+        remember_identity(new_user)
         return redirect(url_for("get_all_posts"))
     return render_template("register.html", form=form, current_user=current_user)
 
@@ -405,46 +1685,67 @@ def register():
 def login():
     form = LoginForm()
     if form.validate_on_submit():
+        check_rate_limit("login_ip", request.remote_addr)
+        check_rate_limit("login_account", form.email.data.lower().strip())
         password = form.password.data
         result = db.session.execute(db.select(User).where(User.email == form.email.data.lower().strip()))
         user = result.scalar()
         if not user:
             flash("That email does not exist, please try again.")
             return redirect(url_for('login'))
-        elif not check_password_hash(user.password, password):
+        elif not check_user_password(user, password):
             flash('Password incorrect, please try again.')
             return redirect(url_for('login'))
         else:
             login_user(user)
+            remember_identity(user)
             return redirect(url_for('get_all_posts'))
     return render_template("login.html", form=form, current_user=current_user)
 
 @app.route('/logout')
 def logout():
+    if current_user.is_authenticated:
+        forget_identity(current_user.id)
     logout_user()
     return redirect(url_for('get_all_posts'))
 
 @app.route('/')
+@cached_page(feed_stamp, tags=lambda: ("feed",))
 def get_all_posts():
-    result = db.session.execute(db.select(BlogPost))
+    result = db.session.execute(
+        db.select(FeedEntry).order_by(FeedEntry.pinned.desc(), FeedEntry.id.desc())
+    )
     posts = result.scalars().all()
     return render_template("index.html", all_posts=posts, current_user=current_user)
 
 @app.route("/post/<int:post_id>", methods=["GET", "POST"])
+@cached_page(lambda post_id: post_stamp(post_id), tags=lambda post_id: (post_tag(post_id),))
 def show_post(post_id):
-    requested_post = db.get_or_404(BlogPost, post_id)
+    # templates should render post.body_html / comment.text_html (sanitized); body is the raw editor HTML
+    requested_post = db.session.get(BlogPost, post_id, options=[undefer(BlogPost.body_html)])
+    if requested_post is None:
+        abort(404)
     comment_form = CommentForm()
     if comment_form.validate_on_submit():
         if not current_user.is_authenticated:
             flash("You need to login or register to comment.")
             return redirect(url_for("login"))
+        check_rate_limit("comment_user", current_user.id)
+        check_rate_limit("comment_ip", request.remote_addr)
         new_comment = Comment(
             text=comment_form.comment_text.data,
-            comment_author=current_user,
+            author_id=current_user.id,
             parent_post=requested_post
         )
         db.session.add(new_comment)
+        db.session.flush()
+        search.index_comment(db.session, new_comment)
+        bump_feed_comments(post_id, 1)
+        data = serialize_comment(new_comment)
         db.session.commit()
+        invalidate_cache("feed", post_tag(post_id))
+        publish_event("comment.added", {"post_id": post_id, **data}, post_tag(post_id))
+        publish_event("post.comments", {"id": post_id, "delta": 1}, "feed")
     return render_template("post.html", post=requested_post, current_user=current_user, form=comment_form)
 
 @app.route("/new-post", methods=["GET", "POST"])
@@ -457,11 +1758,16 @@ def add_new_post():
             subtitle=form.subtitle.data,
             body=form.body.data,
             img_url=form.img_url.data,
-            author=current_user,
+            author_id=current_user.id,
             date=date.today().strftime("%B %d, %Y")
         )
         db.session.add(new_post)
+        db.session.flush()
+        item = feed_item(sync_feed_entry(new_post, author_name=current_user.name))
         db.session.commit()
+        invalidate_cache("feed")
+        enqueue_job("search.index_post", {"id": item["id"]}, dedupe_key=f"index:{item['id']}")
+        publish_event("post.created", item, "feed")
         return redirect(url_for("get_all_posts"))
     return render_template("make-post.html", form=form, current_user=current_user)
 
@@ -480,9 +1786,13 @@ def edit_post(post_id):
         post.title = edit_form.title.data
         post.subtitle = edit_form.subtitle.data
         post.img_url = edit_form.img_url.data
-        post.author = current_user
+        post.author_id = current_user.id
         post.body = edit_form.body.data
+        item = feed_item(sync_feed_entry(post, author_name=current_user.name))
         db.session.commit()
+        invalidate_cache("feed", post_tag(post_id))
+        enqueue_job("search.index_post", {"id": post_id}, dedupe_key=f"index:{post_id}")
+        publish_event("post.updated", item, "feed", post_tag(post_id))
         return redirect(url_for("show_post", post_id=post.id))
     return render_template("make-post.html", form=edit_form, is_edit=True, current_user=current_user)
 
@@ -490,15 +1800,22 @@ def edit_post(post_id):
 @admin_only
 def delete_post(post_id):
     post_to_delete = db.get_or_404(BlogPost, post_id)
+    comment_ids = search.comment_ids_for(db.session, post_id)
+    drop_feed_entry(post_id)
     db.session.delete(post_to_delete)
     db.session.commit()
+    invalidate_cache("feed", post_tag(post_id))
+    enqueue_job("search.remove_post", {"id": post_id, "comment_ids": comment_ids})
+    publish_event("post.deleted", {"id": post_id}, "feed", post_tag(post_id))
     return redirect(url_for('get_all_posts'))
 
 @app.route("/about")
+@cached_page(static_page_stamp, tags=lambda: ())
 def about():
     return render_template("about.html", current_user=current_user)
 
 @app.route("/contact", methods=["GET", "POST"])
+@cached_page(static_page_stamp, tags=lambda: ())
 def contact():
     # If later you use the email flow, pass msg_sent=True/False for the template
     return render_template("contact.html", current_user=current_user)
@@ -506,54 +1823,48 @@ def contact():
 # -----------------------------
 # React build (production serve)
 # -----------------------------
-# If you built Vite (frontend/dist exists), serve the SPA files & fallback to index.html.
-# This keeps your /api/* and server-rendered routes working alongside the SPA.
+# frontend/dist is loaded into an in-memory manifest once per worker (see
+# static_assets.py): hashed assets are served with immutable caching,
+# index.html with ETag revalidation, both gzip/brotli-encoded when accepted.
+# Flask's own static route (static_url_path="/") catches every /<path>, so it
+# is pointed at the manifest too; unknown paths fall back to index.html so
+# React Router works on Render.
+static_manifest = StaticManifest(app.static_folder)
+request_metrics.register_gauge("static_manifest_bytes", static_manifest.total_bytes)
+
+def spa_response(path: str):
+    asset = static_manifest.get(path)
+    if asset is None:
+        # Do NOT intercept /api/*; a missing hashed asset must 404, not turn into HTML
+        if path.startswith(("api", "assets/")):
+            abort(404)
+        asset = static_manifest.get("index.html")
+        if asset is None:
+            return "React build not found. Run: cd frontend && npm run build", 404
+    return static_manifest.respond(asset, request)
+
+def serve_static(filename):
+    return spa_response(filename)
+
+app.view_functions["static"] = serve_static
+
 @app.get("/spa")
 def serve_spa_root():
-    index_path = os.path.join(app.static_folder, "index.html")
-    if os.path.exists(index_path):
-        return send_from_directory(app.static_folder, "index.html")
-    return "React build not found. Run: cd frontend && npm run build", 404
+    return spa_response("index.html")
 
 @app.get("/spa/<path:path>")
 def serve_spa_assets(path):
-    file_path = os.path.join(app.static_folder, path)
-    index_path = os.path.join(app.static_folder, "index.html")
-    if os.path.exists(file_path):
-        return send_from_directory(app.static_folder, path)
-    if os.path.exists(index_path):
-        return send_from_directory(app.static_folder, "index.html")
-    return "React build not found. Run: cd frontend && npm run build", 404
-
-# -----------------------------
-# Entry
-# -----------------------------
-
-# -----------------------------
-# REACT SPA FALLBACK (⭐ REQUIRED FOR RENDER)
-# -----------------------------
+    return spa_response(path)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve_react(path):
-    """
-    Serve index.html for all non-API, non-existing paths
-    so React Router works on Render.
-    """
-    # Do NOT intercept /api/*
-    if path.startswith("api"):
-        abort(404)
-
-    dist_dir = app.static_folder
-    index_path = os.path.join(dist_dir, "index.html")
-
-    # If the file exists in dist, serve it
-    file_path = os.path.join(dist_dir, path)
-    if os.path.exists(file_path) and os.path.isfile(file_path):
-        return send_from_directory(dist_dir, path)
+    return spa_response(path)
 
-    # Else return index.html for React routes
-    return send_from_directory(dist_dir, "index.html")
+@app.cli.command("static-compress")
+def static_compress():
+    """Write best-quality .gz/.br files next to the built frontend assets."""
+    print(f"Wrote {precompress(app.static_folder)} compressed files.")
 
 if __name__ == "__main__":
     # For local dev, Flask runs on :5001; Vite can proxy /api to this.
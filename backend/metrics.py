@@ -0,0 +1,222 @@
+import cProfile
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Request metrics
+# -----------------------------
+# For each endpoint this records latency (as a histogram), SQL query count
+# and time (from engine events), and JSON serialization time. Repeated
+# identical statements within one request are flagged as likely N+1
+# loads. Numbers are per worker process. Scrape every worker, or run one
+# worker per scrape target.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_WS_RE = re.compile(r"\s+")
+
+
+class _EndpointStats:
+    __slots__ = ("count", "errors", "latency_sum", "buckets", "queries", "sql_seconds",
+                 "serialize_seconds", "n_plus_one")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.n_plus_one = 0
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that charges dumps() time to the current request."""
+
+    def dumps(self, obj, **kwargs):
+        with serialize_timer():
+            return super().dumps(obj, **kwargs)
+
+
+@contextmanager
+def serialize_timer():
+    """Count the enclosed block as serialization time for the current request."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and "_metrics" in g:
+            g._metrics["serialize"] += time.perf_counter() - t0
+
+
+class RequestMetrics:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._endpoints: dict[str, _EndpointStats] = {}
+        self._gauges: dict[str, callable] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("METRICS_SERVER_TIMING", False)
+        app.config.setdefault("METRICS_SLOW_MS", 500.0)
+        app.config.setdefault("METRICS_N_PLUS_ONE_THRESHOLD", 5)
+        app.config.setdefault("METRICS_PROFILE_DIR", None)
+        self.app = app
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._before)
+        app.after_request(self._after)
+        event.listen(Engine, "before_cursor_execute", self._before_sql)
+        event.listen(Engine, "after_cursor_execute", self._after_sql)
+        app.extensions["request_metrics"] = self
+
+    def register_gauge(self, name: str, fn):
+        """fn() -> number or {label_value: number}; rendered on every scrape."""
+        self._gauges[name] = fn
+
+    # -- request hooks --
+    def _before(self):
+        g._metrics = {"start": time.perf_counter(), "queries": 0, "sql": 0.0,
+                      "serialize": 0.0, "statements": {}}
+        profile_dir = self.app.config["METRICS_PROFILE_DIR"]
+        if profile_dir:
+            g._metrics["profiler"] = cProfile.Profile()
+            g._metrics["profiler"].enable()
+
+    def _after(self, response):
+        m = g.pop("_metrics", None)
+        if m is None:
+            return response
+        profiler = m.get("profiler")
+        if profiler is not None:
+            profiler.disable()
+        elapsed = time.perf_counter() - m["start"]
+        endpoint = request.endpoint or "unmatched"
+        threshold = self.app.config["METRICS_N_PLUS_ONE_THRESHOLD"]
+        repeated = {sql: n for sql, (n, _) in m["statements"].items() if n >= threshold}
+        if repeated:
+            log.warning("possible N+1 in %s: %s", endpoint,
+                        "; ".join(f"{n}x {sql[:120]}" for sql, n in repeated.items()))
+
+        with self._lock:
+            st = self._endpoints.get(endpoint)
+            if st is None:
+                st = self._endpoints[endpoint] = _EndpointStats()
+            st.count += 1
+            st.errors += response.status_code >= 500
+            st.latency_sum += elapsed
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    st.buckets[i] += 1
+                    break
+            st.queries += m["queries"]
+            st.sql_seconds += m["sql"]
+            st.serialize_seconds += m["serialize"]
+            st.n_plus_one += bool(repeated)
+
+        if self.app.config["METRICS_SERVER_TIMING"]:
+            response.headers["Server-Timing"] = ", ".join([
+                f'db;dur={m["sql"] * 1000:.2f};desc="{m["queries"]} queries"',
+                f'serialize;dur={m["serialize"] * 1000:.2f}',
+                f'total;dur={elapsed * 1000:.2f}',
+            ])
+        if elapsed * 1000 >= self.app.config["METRICS_SLOW_MS"]:
+            self._dump_slow(endpoint, elapsed, m, profiler)
+        return response
+
+    def _dump_slow(self, endpoint: str, elapsed: float, m: dict, profiler):
+        top = sorted(m["statements"].items(), key=lambda kv: kv[1][1], reverse=True)[:10]
+        log.warning("slow request %s", json.dumps({
+            "endpoint": endpoint,
+            "path": request.full_path,
+            "ms": round(elapsed * 1000, 2),
+            "queries": m["queries"],
+            "sql_ms": round(m["sql"] * 1000, 2),
+            "serialize_ms": round(m["serialize"] * 1000, 2),
+            "top_statements": [{"sql": sql[:300], "count": n, "ms": round(t * 1000, 2)}
+                               for sql, (n, t) in top],
+        }))
+        if profiler is not None:
+            profile_dir = self.app.config["METRICS_PROFILE_DIR"]
+            os.makedirs(profile_dir, exist_ok=True)
+            name = f"{int(time.time() * 1000)}-{endpoint.replace('.', '_')}.prof"
+            profiler.dump_stats(os.path.join(profile_dir, name))
+
+    # -- SQL hooks --
+    @staticmethod
+    def _before_sql(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "_metrics" in g:
+            conn.info.setdefault("_metrics_t0", []).append(time.perf_counter())
+
+    @staticmethod
+    def _after_sql(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("_metrics_t0")
+        if not stack or not (has_request_context() and "_metrics" in g):
+            return
+        took = time.perf_counter() - stack.pop()
+        m = g._metrics
+        m["queries"] += 1
+        m["sql"] += took
+        key = _WS_RE.sub(" ", statement).strip()
+        n, t = m["statements"].get(key, (0, 0.0))
+        m["statements"][key] = (n + 1, t + took)
+
+    # -- export --
+    def render_prometheus(self) -> str:
+        out = []
+
+        def family(name, kind, help_text):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            items = sorted(self._endpoints.items())
+            family("http_request_duration_seconds", "histogram", "Request latency by endpoint.")
+            for ep, st in items:
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS, st.buckets):
+                    cumulative += n
+                    out.append(f'http_request_duration_seconds_bucket{{endpoint="{ep}",le="{bound}"}} {cumulative}')
+                out.append(f'http_request_duration_seconds_bucket{{endpoint="{ep}",le="+Inf"}} {st.count}')
+                out.append(f'http_request_duration_seconds_sum{{endpoint="{ep}"}} {st.latency_sum:.6f}')
+                out.append(f'http_request_duration_seconds_count{{endpoint="{ep}"}} {st.count}')
+            for name, attr, kind, help_text in (
+                ("http_request_errors_total", "errors", "counter", "Responses with status >= 500."),
+                ("db_queries_total", "queries", "counter", "SQL statements executed."),
+                ("db_query_seconds_total", "sql_seconds", "counter", "Time spent in SQL."),
+                ("serialization_seconds_total", "serialize_seconds", "counter", "Time spent encoding JSON."),
+                ("n_plus_one_requests_total", "n_plus_one", "counter",
+                 "Requests that repeated one statement at least METRICS_N_PLUS_ONE_THRESHOLD times."),
+            ):
+                family(name, kind, help_text)
+                for ep, st in items:
+                    value = getattr(st, attr)
+                    out.append(f'{name}{{endpoint="{ep}"}} {value:.6f}' if isinstance(value, float)
+                               else f'{name}{{endpoint="{ep}"}} {value}')
+
+        for name, fn in sorted(self._gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                log.exception("metrics gauge %s failed", name)
+                continue
+            family(name, "gauge", name.replace("_", " ") + ".")
+            if isinstance(value, dict):
+                for label, v in sorted(value.items()):
+                    out.append(f'{name}{{key="{label}"}} {v}')
+            else:
+                out.append(f"{name} {value}")
+        return "\n".join(out) + "\n"
@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import os
+
+import sqlalchemy as sa
+from sqlalchemy import text
+
+import search
+
+log = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Schema migrations
+# -----------------------------
+# Versioned, forward-only migrations, recorded in a one-row schema_version
+# table. Workers only run current_version(), which is a single SELECT. The schema is
+# changed by one of:
+#   flask --app main db-upgrade        (deploy step / by hand)
+#   gunicorn.conf.py on_starting hook   (once in the master, before any worker forks)
+#   DB_AUTO_MIGRATE=1                   (dev convenience; the default for `python main.py`)
+# Migrations use their own Core table snapshots, not the ORM models, so an
+# old migration keeps working when the models change later.
+
+MIGRATIONS: list[tuple[int, str, callable]] = []
+
+
+def migration(version: int, name: str):
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def _columns(conn, table: str) -> set[str]:
+    return {c["name"] for c in sa.inspect(conn).get_columns(table)}
+
+
+@migration(1, "baseline tables (adopts databases created by the old create_all block)")
+def _baseline(conn):
+    md = sa.MetaData()
+    sa.Table("users", md,
+             sa.Column("id", sa.Integer, primary_key=True),
+             sa.Column("email", sa.String(100), unique=True),
+             sa.Column("password", sa.String(255)),
+             sa.Column("name", sa.String(100)))
+    sa.Table("blog_posts", md,
+             sa.Column("id", sa.Integer, primary_key=True),
+             sa.Column("author_id", sa.Integer, sa.ForeignKey("users.id")),
+             sa.Column("title", sa.String(250), unique=True, nullable=False),
+             sa.Column("subtitle", sa.String(250), nullable=False),
+             sa.Column("date", sa.String(250), nullable=False),
+             sa.Column("body", sa.Text, nullable=False),
+             sa.Column("img_url", sa.String(250), nullable=False),
+             sa.Column("pinned", sa.Boolean, nullable=False, server_default=sa.false()),
+             sa.Column("version", sa.Integer, nullable=False, server_default="1"),
+             sa.Column("updated_at", sa.DateTime))
+    sa.Table("comments", md,
+             sa.Column("id", sa.Integer, primary_key=True),
+             sa.Column("text", sa.Text, nullable=False),
+             sa.Column("author_id", sa.Integer, sa.ForeignKey("users.id")),
+             sa.Column("post_id", sa.Integer, sa.ForeignKey("blog_posts.id")),
+             sa.Column("updated_at", sa.DateTime))
+    sa.Table("contact_messages", md,
+             sa.Column("id", sa.Integer, primary_key=True),
+             sa.Column("name", sa.String(120), nullable=False),
+             sa.Column("email", sa.String(200), nullable=False),
+             sa.Column("message", sa.Text, nullable=False),
+             sa.Column("date", sa.String(50), nullable=False))
+    sa.Table("feed_entries", md,
+             sa.Column("id", sa.Integer, primary_key=True, autoincrement=False),
+             sa.Column("title", sa.String(250), nullable=False),
+             sa.Column("subtitle", sa.String(250), nullable=False),
+             sa.Column("date", sa.String(250), nullable=False),
+             sa.Column("img_url", sa.String(250), nullable=False),
+             sa.Column("author_name", sa.String(100)),
+             sa.Column("pinned", sa.Boolean, nullable=False, server_default=sa.false()),
+             sa.Column("comment_count", sa.Integer, nullable=False, server_default="0"))
+    md.create_all(conn, checkfirst=True)
+
+    # columns added to tables that existed before migrations
+    cols = _columns(conn, "blog_posts")
+    if "pinned" not in cols:
+        conn.execute(text("ALTER TABLE blog_posts ADD COLUMN pinned BOOLEAN NOT NULL DEFAULT FALSE"))
+    if "version" not in cols:
+        conn.execute(text("ALTER TABLE blog_posts ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+    if "updated_at" not in cols:
+        conn.execute(text("ALTER TABLE blog_posts ADD COLUMN updated_at TIMESTAMP"))
+    if "updated_at" not in _columns(conn, "comments"):
+        conn.execute(text("ALTER TABLE comments ADD COLUMN updated_at TIMESTAMP"))
+    if conn.dialect.name == "postgresql":
+        # 16-byte salts push pbkdf2 hashes past the old VARCHAR(100)
+        conn.execute(text("ALTER TABLE users ALTER COLUMN password TYPE VARCHAR(255)"))
+
+
+@migration(2, "indexes for feed paging, comment lookups and login")
+def _indexes(conn):
+    insp = sa.inspect(conn)
+    # login looks users up by email; the UNIQUE constraint usually provides the index already
+    email_indexed = any(u["column_names"] == ["email"] for u in insp.get_unique_constraints("users")) or any(
+        i["column_names"] == ["email"] for i in insp.get_indexes("users"))
+    if not email_indexed:
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)"))
+    for stmt in (
+        "CREATE INDEX IF NOT EXISTS ix_comments_post_id ON comments (post_id)",
+        "CREATE INDEX IF NOT EXISTS ix_comments_author_id ON comments (author_id)",
+        "CREATE INDEX IF NOT EXISTS ix_blog_posts_pinned_id ON blog_posts (pinned, id)",
+        "CREATE INDEX IF NOT EXISTS ix_blog_posts_updated_at ON blog_posts (updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_feed_entries_pinned_id ON feed_entries (pinned, id)",
+    ):
+        conn.execute(text(stmt))
+
+
+@migration(3, "full-text search index")
+def _search(conn):
+    search.ensure_schema(conn)
+
+
+@migration(4, "backfill the feed projection")
+def _feed_backfill(conn):
+    if conn.execute(text("SELECT 1 FROM feed_entries LIMIT 1")).first() is not None:
+        return
+    conn.execute(text("""
+        INSERT INTO feed_entries (id, title, subtitle, date, img_url, author_name, pinned, comment_count)
+        SELECT p.id, p.title, p.subtitle, p.date, p.img_url, u.name, p.pinned, COALESCE(c.n, 0)
+        FROM blog_posts p
+        LEFT OUTER JOIN users u ON u.id = p.author_id
+        LEFT OUTER JOIN (SELECT post_id, COUNT(id) AS n FROM comments GROUP BY post_id) c ON c.post_id = p.id
+    """))
+
+
+@migration(5, "users.avatar_hash, backfilled from email")
+def _avatar_hash(conn):
+    if "avatar_hash" not in _columns(conn, "users"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN avatar_hash VARCHAR(32)"))
+    rows = conn.execute(text("SELECT id, email FROM users WHERE avatar_hash IS NULL AND email IS NOT NULL")).all()
+    if rows:
+        conn.execute(text("UPDATE users SET avatar_hash = :h WHERE id = :id"), [
+            {"id": r.id, "h": hashlib.md5(r.email.strip().lower().encode("utf-8")).hexdigest()} for r in rows
+        ])
+
+
+@migration(6, "stored sanitized HTML, excerpt and reading time (fill with `flask content-backfill`)")
+def _rendered_content(conn):
+    for table, column, ddl in (
+        ("blog_posts", "body_html", "TEXT"),
+        ("blog_posts", "excerpt", "VARCHAR(300)"),
+        ("blog_posts", "reading_minutes", "INTEGER"),
+        ("comments", "text_html", "TEXT"),
+        ("feed_entries", "excerpt", "VARCHAR(300)"),
+        ("feed_entries", "reading_minutes", "INTEGER"),
+    ):
+        if column not in _columns(conn, table):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+@migration(7, "feed_version counter (the feed's ETag)")
+def _feed_version(conn):
+    md = sa.MetaData()
+    feed_version = sa.Table("feed_version", md,
+                            sa.Column("id", sa.Integer, primary_key=True),
+                            sa.Column("version", sa.Integer, nullable=False),
+                            sa.Column("updated_at", sa.DateTime, nullable=False))
+    md.create_all(conn)
+    if conn.execute(sa.select(feed_version.c.id)).first() is None:
+        conn.execute(feed_version.insert().values(id=1, version=1, updated_at=sa.func.current_timestamp()))
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def current_version(engine) -> int:
+    """The one cheap query workers run at startup; 0 means an unmigrated database."""
+    with engine.connect() as conn:
+        try:
+            return conn.execute(text("SELECT version FROM schema_version")).scalar() or 0
+        except sa.exc.DBAPIError:
+            conn.rollback()
+            return 0
+
+
+def upgrade(engine, target: int | None = None) -> list[int]:
+    """Apply pending migrations, each in its own transaction; returns the versions applied."""
+    target = latest_version() if target is None else target
+    applied = []
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+        if conn.execute(text("SELECT COUNT(*) FROM schema_version")).scalar() == 0:
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (0)"))
+    for version, name, fn in MIGRATIONS:
+        if version > target:
+            break
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # serialize concurrent upgraders; released at commit
+                conn.execute(text("SELECT pg_advisory_xact_lock(727172)"))
+            # re-read inside the transaction so a racing upgrader can't apply it twice
+            if conn.execute(text("SELECT version FROM schema_version")).scalar() >= version:
+                continue
+            log.info("applying migration %d: %s", version, name)
+            fn(conn)
+            conn.execute(text("UPDATE schema_version SET version = :v"), {"v": version})
+            applied.append(version)
+    return applied
+
+
+def ensure_current(engine, auto: bool):
+    version = current_version(engine)
+    if version >= latest_version():
+        return
+    if not auto:
+        # warn rather than raise so `flask --app main db-upgrade` can still import the app
+        log.error("database schema is at version %d, this code needs %d; run: flask --app main db-upgrade",
+                  version, latest_version())
+        return
+    upgrade(engine)
+
+
+def resolve_db_url(url: str, instance_path: str) -> str:
+    """Match Flask-SQLAlchemy: relative sqlite paths live in the app's instance folder."""
+    if url.startswith("sqlite:///") and not url.startswith("sqlite:////"):
+        path = url[len("sqlite:///"):]
+        if path and path != ":memory:" and not path.startswith("file:"):
+            os.makedirs(instance_path, exist_ok=True)
+            return "sqlite:///" + os.path.join(instance_path, path)
+    return url
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+
+# -----------------------------
+# Password hashing pool
+# -----------------------------
+# pbkdf2 is deliberately slow. Running it on a small bounded pool keeps a burst
+# of logins from tying up every request thread. hashlib releases the GIL
+# while it derives keys, so a thread pool gives real parallelism. A process
+# pool is there for interpreters where that isn't true.
+
+class HasherBusy(Exception):
+    """Raised when the pool and its queue are full, or a hash outlasts the timeout; callers answer 503."""
+
+
+def normalize_method(method: str) -> str:
+    """Spell out the cost params werkzeug fills in, e.g. pbkdf2:sha256 -> pbkdf2:sha256:600000."""
+    parts = method.split(":")
+    if parts[0] == "pbkdf2":
+        if len(parts) == 1:
+            parts.append("sha256")
+        if len(parts) == 2:
+            parts.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    elif parts[0] == "scrypt" and len(parts) == 1:
+        parts += ["32768", "8", "1"]
+    return ":".join(parts)
+
+
+class PasswordHasher:
+    def __init__(self, method: str = "pbkdf2:sha256:600000", salt_length: int = 16,
+                 workers: int = 2, max_pending: int = 16, use_processes: bool = False,
+                 timeout: float = 10.0):
+        self.method = normalize_method(method)
+        self.salt_length = salt_length
+        self.timeout = timeout
+        pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self._pool = pool_cls(max_workers=workers)
+        # running + queued jobs; anything beyond this is rejected instead of queued
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()  # still queued: drop it; already running: its slot frees when it finishes
+            raise HasherBusy() from None
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, stored: str, password: str) -> bool:
+        return self._run(check_password_hash, stored, password)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """True when `stored` was made with a different method/cost or salt length than configured."""
+        try:
+            method, salt, _ = stored.split("$", 2)
+        except ValueError:
+            return True
+        return method != self.method or len(salt) != self.salt_length
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
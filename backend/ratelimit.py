@@ -0,0 +1,192 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from local_sqlite import LocalConnection
+
+
+# -----------------------------
+# Rate limiting
+# -----------------------------
+# Token buckets, stored as GCRA state: one "theoretical arrival time" (tat)
+# per key instead of a (tokens, last_refill) pair. A limit of N per period
+# refills one token every period/N seconds and allows bursts of N. A hit
+# moves tat forward by one interval, and the request is refused while tat
+# would run more than a full burst ahead of now. Each check is one read and
+# one write. A key whose tat has passed is a full bucket, so it can be
+# dropped at any time without changing any decision.
+
+class RateLimited(Exception):
+    def __init__(self, rule: str, retry_after: float):
+        super().__init__(f"rate limit {rule} exceeded")
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_LIMIT_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+
+class Limit:
+    __slots__ = ("count", "period", "interval", "burst")
+
+    def __init__(self, count: int, period: float):
+        self.count = count
+        self.period = period
+        self.interval = period / count  # seconds per token
+        self.burst = period             # a full bucket is `count` intervals
+
+    def __repr__(self):
+        return f"Limit({self.count}/{self.period}s)"
+
+
+def parse_limit(spec: str | None) -> Limit | None:
+    """'10/minute', '5/hour', '100/10minutes'; empty or '0/...' disables the rule."""
+    if not spec:
+        return None
+    m = _LIMIT_RE.match(spec)
+    if not m:
+        raise ValueError(f"bad rate limit {spec!r}, expected e.g. '10/minute'")
+    count = int(m.group(1))
+    if count == 0:
+        return None
+    return Limit(count, int(m.group(2) or 1) * PERIODS[m.group(3)])
+
+
+def _gcra(tat: float | None, now: float, limit: Limit) -> tuple[float | None, float]:
+    """-> (new tat to store or None to leave it, retry_after; 0 means allowed)."""
+    new_tat = max(tat or now, now) + limit.interval
+    allow_at = new_tat - limit.burst
+    if allow_at > now:
+        return None, allow_at - now
+    return new_tat, 0.0
+
+
+class LocalLimiter:
+    """Per-process buckets in an LRU capped at max_keys, so IP churn can't grow it without bound."""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._tat: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: Limit) -> float:
+        now = time.monotonic()
+        with self._lock:
+            new_tat, retry_after = _gcra(self._tat.get(key), now, limit)
+            if new_tat is not None:
+                self._tat[key] = new_tat
+                self._tat.move_to_end(key)
+                while len(self._tat) > self.max_keys:
+                    self._tat.popitem(last=False)
+            return retry_after
+
+    def size(self) -> int:
+        return len(self._tat)
+
+
+class SQLiteLimiter:
+    """
+    Buckets in a local SQLite file shared by every worker on the host, so a
+    limit holds per host rather than per process. This is the stand-in for
+    RedisLimiter.
+    """
+
+    name = "sqlite"
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, max_keys: int = 100_000):
+        self.path = path
+        self.max_keys = max_keys
+        self._conn = LocalConnection(self.path, timeout=5)
+        self._hits = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tat REAL NOT NULL)"
+        )
+
+    def hit(self, key: str, limit: Limit) -> float:
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tat FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            new_tat, retry_after = _gcra(row[0] if row else None, now, limit)
+            if new_tat is not None:
+                conn.execute("INSERT OR REPLACE INTO rate_buckets (key, tat) VALUES (?, ?)", (key, new_tat))
+        self._hits += 1
+        if self._hits % self.PRUNE_EVERY == 0:
+            self._prune(now)
+        return retry_after
+
+    def _prune(self, now: float):
+        conn = self._conn()
+        with conn:
+            # full buckets carry no state; past that, drop the oldest to stay under max_keys
+            conn.execute("DELETE FROM rate_buckets WHERE tat <= ?", (now,))
+            conn.execute(
+                "DELETE FROM rate_buckets WHERE key IN "
+                "(SELECT key FROM rate_buckets ORDER BY tat LIMIT max(0, (SELECT COUNT(*) FROM rate_buckets) - ?))",
+                (self.max_keys,),
+            )
+
+    def size(self) -> int:
+        (count,) = self._conn().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()
+        return count
+
+
+class RedisLimiter:
+    """Buckets in Redis (needs the optional `redis` package); one atomic script call per check."""
+
+    name = "redis"
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local interval = tonumber(ARGV[2])
+    local burst = tonumber(ARGV[3])
+    local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+    local new_tat = math.max(tat, now) + interval
+    local allow_at = new_tat - burst
+    if allow_at > now then return tostring(allow_at - now) end
+    redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil((new_tat - now) * 1000))
+    return '0'
+    """
+
+    def __init__(self, url: str, prefix: str = "blog:ratelimit:"):
+        import redis  # optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def hit(self, key: str, limit: Limit) -> float:
+        return float(self._script(keys=[self.prefix + key], args=[time.time(), limit.interval, limit.burst]))
+
+    def size(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(self.prefix + "*"))
+
+
+class NullLimiter:
+    """Limiter that allows everything (RATE_LIMIT_URL=none)."""
+
+    name = "none"
+
+    def hit(self, key, limit) -> float:
+        return 0.0
+
+    def size(self) -> int:
+        return 0
+
+
+def make_limiter(url: str | None, max_keys: int = 100_000):
+    """memory (default) | none | sqlite:///path/to/ratelimit.db | redis://host:6379/0"""
+    url = (url or "memory").strip()
+    if url == "memory":
+        return LocalLimiter(max_keys=max_keys)
+    if url == "none":
+        return NullLimiter()
+    if url.startswith("sqlite:///"):
+        return SQLiteLimiter(url[len("sqlite:///"):], max_keys=max_keys)
+    if url.startswith(("redis://", "rediss://")):
+        return RedisLimiter(url)
+    raise ValueError(f"Unknown RATE_LIMIT_URL: {url!r}")
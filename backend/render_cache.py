@@ -0,0 +1,53 @@
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+# -----------------------------
+# Jinja fragment cache
+# -----------------------------
+# {% cache %} stores the rendered HTML of a block under a key built from its
+# arguments, so a logged-in page re-renders only the personalized parts
+# (navbar, forms) and reuses the expensive ones:
+#
+#   {% cache "post-body", post.id, post.version %}
+#     {{ post.body | safe }}
+#   {% endcache %}
+#   {% cache "comments", post.id, post.version, current_user.is_admin %}
+#     {% for comment in post.comments %} ... {% endfor %}
+#   {% endcache %}
+#
+# Put a content version in the key (post.version moves on every post or
+# comment change, see bump_versions in main.py) and anything else the block
+# depends on, such as admin-only buttons. Stale fragments then simply stop
+# being looked up, and the LRU ages them out. Never wrap a form: its CSRF
+# token is per session.
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        # any object with get(key) / set(key, value); None disables caching
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render", [nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = "fragment:" + ":".join(str(p) for p in parts)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+        html = Markup(caller())
+        cache.set(key, html)
+        return html
@@ -0,0 +1,228 @@
+import html
+import re
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import undefer
+
+
+# -----------------------------
+# Full-text search index
+# -----------------------------
+# SQLite: an FTS5 virtual table. Posts use rowid = 2*id, comments 2*id + 1,
+#         so upserts/deletes are rowid lookups rather than FTS scans.
+# Postgres: a search_documents table with a stored, weighted tsvector + GIN.
+# Posts and comments share one index so a query ranks them together.
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+# snippet highlight sentinels; swapped for <mark> after html-escaping the snippet
+_HL_START, _HL_END = "\x02", "\x03"
+
+
+def plain_text(value: str | None) -> str:
+    """Strip CKEditor HTML down to indexable text."""
+    return " ".join(html.unescape(_TAG_RE.sub(" ", value or "")).split())
+
+
+def _highlight(snippet: str | None) -> str:
+    return (html.escape(snippet or "")
+            .replace(_HL_START, "<mark>")
+            .replace(_HL_END, "</mark>"))
+
+
+def _dialect(session) -> str:
+    # accepts a Session or a Connection (migrations run on a bare connection)
+    bind = session.get_bind() if hasattr(session, "get_bind") else session
+    return bind.dialect.name
+
+
+def is_supported(session) -> bool:
+    return _dialect(session) in ("sqlite", "postgresql")
+
+
+def ensure_schema(session):
+    dialect = _dialect(session)
+    if dialect == "sqlite":
+        session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+            "kind UNINDEXED, ref_id UNINDEXED, post_id UNINDEXED, "
+            "title, subtitle, body, tokenize='porter unicode61')"
+        ))
+    elif dialect == "postgresql":
+        session.execute(text("""
+            CREATE TABLE IF NOT EXISTS search_documents (
+                kind VARCHAR(16) NOT NULL,
+                ref_id INTEGER NOT NULL,
+                post_id INTEGER NOT NULL,
+                title TEXT NOT NULL DEFAULT '',
+                subtitle TEXT NOT NULL DEFAULT '',
+                body TEXT NOT NULL DEFAULT '',
+                tsv tsvector GENERATED ALWAYS AS (
+                    setweight(to_tsvector('english', title), 'A') ||
+                    setweight(to_tsvector('english', subtitle), 'B') ||
+                    setweight(to_tsvector('english', body), 'C')
+                ) STORED,
+                PRIMARY KEY (kind, ref_id)
+            )
+        """))
+        session.execute(text("CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN (tsv)"))
+        session.execute(text("CREATE INDEX IF NOT EXISTS ix_search_documents_post_id ON search_documents (post_id)"))
+
+
+def _upsert(session, docs: list[dict]):
+    """docs: {kind, ref_id, post_id, title, subtitle, body}; written with executemany."""
+    if not docs:
+        return
+    if _dialect(session) == "sqlite":
+        for d in docs:
+            d["rowid"] = d["ref_id"] * 2 + (d["kind"] == "comment")
+        session.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), docs)
+        session.execute(text(
+            "INSERT INTO search_index (rowid, kind, ref_id, post_id, title, subtitle, body) "
+            "VALUES (:rowid, :kind, :ref_id, :post_id, :title, :subtitle, :body)"
+        ), docs)
+    else:
+        session.execute(text(
+            "INSERT INTO search_documents (kind, ref_id, post_id, title, subtitle, body) "
+            "VALUES (:kind, :ref_id, :post_id, :title, :subtitle, :body) "
+            "ON CONFLICT (kind, ref_id) DO UPDATE SET post_id = EXCLUDED.post_id, "
+            "title = EXCLUDED.title, subtitle = EXCLUDED.subtitle, body = EXCLUDED.body"
+        ), docs)
+
+
+# documents are built from the sanitized HTML (body_html / text_html), so text
+# inside dropped <script>/<style> elements never becomes searchable or a snippet
+def _post_doc(post) -> dict:
+    return {"kind": "post", "ref_id": post.id, "post_id": post.id, "title": post.title or "",
+            "subtitle": post.subtitle or "", "body": plain_text(post.body_html)}
+
+
+def _comment_doc(comment) -> dict:
+    return {"kind": "comment", "ref_id": comment.id, "post_id": comment.post_id, "title": "",
+            "subtitle": "", "body": plain_text(comment.text_html)}
+
+
+def index_post(session, post):
+    """Add or refresh a post's document. Call after flush so post.id is set."""
+    index_posts(session, [post])
+
+
+def index_comment(session, comment):
+    index_comments(session, [comment])
+
+
+def index_posts(session, posts):
+    """Batch form of index_post: one executemany for the whole list."""
+    if is_supported(session):
+        _upsert(session, [_post_doc(p) for p in posts])
+
+
+def index_comments(session, comments):
+    if is_supported(session):
+        _upsert(session, [_comment_doc(c) for c in comments])
+
+
+def remove_comment(session, comment_id: int):
+    dialect = _dialect(session)
+    if dialect == "sqlite":
+        session.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": comment_id * 2 + 1})
+    elif dialect == "postgresql":
+        session.execute(text("DELETE FROM search_documents WHERE kind = 'comment' AND ref_id = :id"), {"id": comment_id})
+
+
+def comment_ids_for(session, post_id: int) -> list[int]:
+    return session.execute(text("SELECT id FROM comments WHERE post_id = :pid"), {"pid": post_id}).scalars().all()
+
+
+def remove_post(session, post_id: int, comment_ids: list[int] | None = None):
+    """
+    Drop a post and all of its comments. Call before the comment rows are
+    deleted, or pass the comment_ids collected before the delete.
+    """
+    dialect = _dialect(session)
+    if dialect == "sqlite":
+        if comment_ids is None:
+            comment_ids = comment_ids_for(session, post_id)
+        rowids = [{"rowid": post_id * 2}] + [{"rowid": cid * 2 + 1} for cid in comment_ids]
+        session.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), rowids)
+    elif dialect == "postgresql":
+        session.execute(text("DELETE FROM search_documents WHERE post_id = :pid"), {"pid": post_id})
+
+
+def _fts5_query(q: str) -> str:
+    # quote every term so user input can't inject FTS5 syntax; prefix-match the last one
+    words = _WORD_RE.findall(q)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(session, q: str, limit: int, offset: int) -> list[dict]:
+    """Ranked hits (best first) with an html-safe snippet where matches are wrapped in <mark>."""
+    dialect = _dialect(session)
+    params = {"limit": limit, "offset": offset}
+    if dialect == "sqlite":
+        params["q"] = _fts5_query(q)
+        if not params["q"]:
+            return []
+        # bm25 weights follow column order: kind, ref_id, post_id, title, subtitle, body
+        rows = session.execute(text(
+            "SELECT s.kind, s.ref_id, s.post_id, p.title AS post_title, "
+            f"snippet(search_index, -1, '{_HL_START}', '{_HL_END}', '…', 16) AS snippet, "
+            "bm25(search_index, 0, 0, 0, 10.0, 4.0, 1.0) AS score "
+            "FROM search_index s JOIN blog_posts p ON p.id = s.post_id "
+            "WHERE search_index MATCH :q ORDER BY score LIMIT :limit OFFSET :offset"
+        ), params).all()
+        # bm25() is lower-is-better; flip so rank reads higher-is-better everywhere
+        return [_hit(r, -r.score) for r in rows]
+    if dialect == "postgresql":
+        params["q"] = q
+        params["opts"] = f"StartSel={_HL_START}, StopSel={_HL_END}, MaxWords=30, MinWords=8, MaxFragments=1"
+        rows = session.execute(text(
+            "SELECT d.kind, d.ref_id, d.post_id, p.title AS post_title, "
+            "ts_headline('english', d.title || ' ' || d.subtitle || ' ' || d.body, query, :opts) AS snippet, "
+            "ts_rank_cd(d.tsv, query) AS score "
+            "FROM search_documents d JOIN blog_posts p ON p.id = d.post_id, "
+            "websearch_to_tsquery('english', :q) query "
+            "WHERE d.tsv @@ query ORDER BY score DESC LIMIT :limit OFFSET :offset"
+        ), params).all()
+        return [_hit(r, r.score) for r in rows]
+    raise ValueError(f"full-text search is not available on {dialect}")
+
+
+def _hit(row, score) -> dict:
+    return {
+        "kind": row.kind,
+        "id": int(row.ref_id),
+        "post_id": int(row.post_id),
+        "post_title": row.post_title,
+        "snippet": _highlight(row.snippet),
+        "rank": round(float(score), 6),
+    }
+
+
+def rebuild(session, post_model, comment_model, batch_size: int = 1000) -> int:
+    """Re-index every post and comment in batches; returns the number of documents written."""
+    if _dialect(session) == "sqlite":
+        session.execute(text("DELETE FROM search_index"))
+    elif _dialect(session) == "postgresql":
+        session.execute(text("TRUNCATE search_documents"))
+    else:
+        return 0
+    written = 0
+    for model, index in ((post_model, index_posts), (comment_model, index_comments)):
+        last_id = 0
+        while True:
+            rows = session.execute(
+                select(model).options(undefer("*")).where(model.id > last_id).order_by(model.id).limit(batch_size)
+            ).scalars().all()
+            if not rows:
+                break
+            index(session, rows)
+            written += len(rows)
+            last_id = rows[-1].id
+            session.commit()
+            session.expunge_all()
+    return written
@@ -0,0 +1,163 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from datetime import datetime, timezone
+
+from werkzeug.wrappers import Request, Response
+
+try:
+    import brotli  # optional; without it only gzip variants are served
+except ImportError:
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Static asset manifest
+# -----------------------------
+# The Vite build (frontend/dist) is read into memory once per worker, with
+# gzip/brotli variants of every compressible file, so serving an asset is a
+# dict lookup: no stat() or open() per request. Precompressed siblings
+# (app.js.br / app.js.gz, written by precompress() or the build) are used
+# as-is; anything missing is compressed at load time at a cheaper level.
+# Restart the workers to pick up a new build.
+
+# Vite emits content-hashed names under assets/, e.g. assets/index-B3x9kQ2a.js
+HASHED_NAME_RE = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+COMPRESSIBLE_TYPES = {
+    "application/javascript", "application/json", "application/manifest+json",
+    "application/wasm", "application/xml", "image/svg+xml", "image/x-icon",
+}
+MIN_COMPRESS_SIZE = 1024
+SIBLING_EXT = {"br": ".br", "gzip": ".gz"}
+
+
+def _compressible(mimetype: str, size: int) -> bool:
+    return size >= MIN_COMPRESS_SIZE and (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES)
+
+
+def _compress(encoding: str, body: bytes, best: bool) -> bytes | None:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=11 if best else 5)
+    return None
+
+
+class Asset:
+    __slots__ = ("path", "mimetype", "etag", "last_modified", "cache_control", "variants")
+
+    def __init__(self, path, mimetype, etag, last_modified, cache_control, variants):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cache_control = cache_control
+        self.variants = variants  # {"identity" | "gzip" | "br": bytes}
+
+
+class StaticManifest:
+    def __init__(self, root: str):
+        self.root = root
+        self.assets: dict[str, Asset] = {}
+        self.load()
+
+    def load(self):
+        assets = {}
+        if os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    if name.endswith((".gz", ".br")):
+                        continue
+                    full = os.path.join(dirpath, name)
+                    rel = os.path.relpath(full, self.root).replace(os.sep, "/")
+                    assets[rel] = self._load_one(rel, full)
+        self.assets = assets
+        log.info("static manifest: %d files from %s", len(assets), self.root)
+
+    def _load_one(self, rel: str, full: str) -> Asset:
+        with open(full, "rb") as f:
+            body = f.read()
+        mimetype = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        variants = {"identity": body}
+        if _compressible(mimetype, len(body)):
+            for encoding, ext in SIBLING_EXT.items():
+                if os.path.exists(full + ext) and os.path.getmtime(full + ext) >= os.path.getmtime(full):
+                    with open(full + ext, "rb") as f:
+                        data = f.read()
+                else:
+                    data = _compress(encoding, body, best=False)
+                # keep a variant only when it actually saves bytes
+                if data is not None and len(data) < len(body) * 0.9:
+                    variants[encoding] = data
+        return Asset(
+            path=rel,
+            mimetype=mimetype,
+            etag=hashlib.sha1(body).hexdigest()[:20],
+            last_modified=datetime.fromtimestamp(int(os.path.getmtime(full)), timezone.utc),
+            cache_control=IMMUTABLE if HASHED_NAME_RE.match(rel) else REVALIDATE,
+            variants=variants,
+        )
+
+    def get(self, path: str) -> Asset | None:
+        return self.assets.get(path.lstrip("/"))
+
+    def total_bytes(self) -> int:
+        return sum(len(v) for a in self.assets.values() for v in a.variants.values())
+
+    def respond(self, asset: Asset, request: Request) -> Response:
+        encoding = "identity"
+        if len(asset.variants) > 1:
+            accepted = request.accept_encodings
+            # brotli first: smaller than gzip at the same quality
+            for candidate in ("br", "gzip"):
+                if candidate in asset.variants and accepted.quality(candidate) > 0:
+                    encoding = candidate
+                    break
+        response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        if len(asset.variants) > 1:
+            response.vary.add("Accept-Encoding")
+        # each encoding is a different byte stream, so it needs its own validator
+        response.set_etag(asset.etag if encoding == "identity" else f"{asset.etag}-{encoding}")
+        response.last_modified = asset.last_modified
+        response.headers["Cache-Control"] = asset.cache_control
+        return response.make_conditional(request)
+
+
+def precompress(root: str) -> int:
+    """Write best-quality .gz/.br siblings for compressible files whose siblings are stale."""
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith((".gz", ".br")):
+                continue
+            full = os.path.join(dirpath, name)
+            mimetype = mimetypes.guess_type(name)[0] or ""
+            if not _compressible(mimetype, os.path.getsize(full)):
+                continue
+            mtime = os.path.getmtime(full)
+            body = None
+            for encoding, ext in SIBLING_EXT.items():
+                target = full + ext
+                if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                    continue
+                if body is None:
+                    with open(full, "rb") as f:
+                        body = f.read()
+                data = _compress(encoding, body, best=True)
+                if data is None:
+                    continue
+                with open(target + ".tmp", "wb") as f:
+                    f.write(data)
+                os.replace(target + ".tmp", target)
+                written += 1
+    return written
@@ -0,0 +1,113 @@
+"""
+Shared fixtures. Run from backend/:
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+
+main.py configures itself from the environment at import, so the
+environment is set here before it is imported: a throwaway SQLite file,
+the in-process event broker, no background job threads, no rate limits
+and a cheap password hash.
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="blog-tests-")
+os.environ.update({
+    "SECRET_KEY": "test-" + "x" * 32,
+    "DB_URI": "sqlite:///" + os.path.join(_tmp, "blog.db"),
+    "DB_AUTO_MIGRATE": "1",
+    "JOBS_PATH": os.path.join(_tmp, "jobs.db"),
+    "JOB_WORKERS": "0",
+    "EVENTS_URL": "memory",
+    "RATE_LIMIT_URL": "none",
+    "RESPONSE_CACHE_URL": "memory",
+    "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+})
+os.environ.pop("FLASK_KEY", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+main.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+
+# rows here survive between tests; everything else is emptied
+KEEP_TABLES = {"feed_version"}
+
+
+@pytest.fixture
+def app():
+    with main.app.app_context():
+        for table in reversed(main.db.metadata.sorted_tables):
+            if table.name not in KEEP_TABLES:
+                main.db.session.execute(table.delete())
+        main.db.session.commit()
+    main.response_cache.clear()
+    main.identity_cache.clear()
+    main.job_queue.drain()
+    yield main.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(client):
+    """The first account registered becomes the admin; `client` stays logged in as it."""
+    resp = client.post("/api/register", json={"email": "admin@example.com", "name": "Admin", "password": "pw"})
+    assert resp.status_code == 200, resp.get_json()
+    return client
+
+
+def make_posts(client, n: int, start: int = 0) -> list[int]:
+    ids = []
+    for i in range(start, start + n):
+        resp = client.post("/api/posts", json={
+            "title": f"Post {i}", "subtitle": "sub", "body": f"<p>body {i}</p>", "img_url": "http://img",
+        })
+        assert resp.status_code == 200, resp.get_json()
+        ids.append(resp.get_json()["id"])
+    return ids
+
+
+def make_users(app, n: int, start: int = 0) -> list[int]:
+    with app.app_context():
+        users = [main.User(email=f"user{i}@example.com", name=f"User {i}", password="x")
+                 for i in range(start, start + n)]
+        main.db.session.add_all(users)
+        main.db.session.commit()
+        return [u.id for u in users]
+
+
+def make_comments(app, post_id: int, author_ids: list[int]):
+    # straight through the ORM so every author can comment without logging in
+    with app.app_context():
+        main.db.session.add_all(
+            main.Comment(text=f"comment by {a}", author_id=a, post_id=post_id) for a in author_ids
+        )
+        main.db.session.commit()
+    main.invalidate_cache("feed", main.post_tag(post_id))
+
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements run inside the block."""
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with main.app.app_context():
+        engine = main.db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,64 @@
+import io
+from email.message import Message
+
+import pytest
+
+import main
+from cache import LocalCache
+from ratelimit import make_limiter, parse_limit
+
+DIGEST = "0" * 32
+
+
+class FakeResponse(io.BytesIO):
+    def __init__(self, body: bytes):
+        super().__init__(body)
+        self.headers = Message()
+        self.headers["Content-Type"] = "image/png"
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    fetched = []
+
+    def fake_urlopen(url, timeout):
+        fetched.append(url)
+        return FakeResponse(b"png" * 100)
+
+    monkeypatch.setattr(main, "urlopen", fake_urlopen)
+    main.avatar_cache.clear()
+    yield fetched
+    main.avatar_cache.clear()
+
+
+def test_avatar_is_fetched_once_then_served_from_the_cache(client, upstream):
+    for _ in range(3):
+        resp = client.get(f"/api/avatar/{DIGEST}?s=48")
+        assert resp.status_code == 200 and resp.mimetype == "image/png"
+    assert len(upstream) == 1
+
+
+def test_avatar_misses_are_rate_limited(client, upstream, monkeypatch):
+    monkeypatch.setattr(main, "rate_limiter", make_limiter("memory"))
+    monkeypatch.setitem(main.rate_limits, "avatar_ip", parse_limit("2/minute"))
+    for size in (32, 48):
+        assert client.get(f"/api/avatar/{DIGEST}?s={size}").status_code == 200
+    # over the limit the browser is sent to gravatar, cached sizes still come from us
+    resp = client.get(f"/api/avatar/{DIGEST}?s=64")
+    assert resp.status_code == 302 and resp.location.startswith("https://www.gravatar.com/avatar/")
+    assert client.get(f"/api/avatar/{DIGEST}?s=32").status_code == 200
+    assert len(upstream) == 2
+
+
+def test_local_cache_max_bytes_evicts_least_recently_used():
+    cache = LocalCache(max_entries=100, ttl=60, max_bytes=10)
+    cache.set("a", b"xxxx")
+    cache.set("b", b"xxxx")
+    cache.get("a")
+    cache.set("c", b"xxxx")
+    assert cache.get("b") is None and cache.get("a") == b"xxxx" and cache.get("c") == b"xxxx"
+    assert cache.bytes == 8
+    cache.set("a", b"x")  # replacing an entry releases its old size
+    assert cache.bytes == 5
+    cache.clear()
+    assert cache.bytes == 0
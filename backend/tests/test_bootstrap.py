@@ -0,0 +1,21 @@
+from conftest import make_posts
+
+import main
+
+
+def test_bootstrap_carries_me_admin_and_first_feed_page(admin, app):
+    make_posts(admin, 3)
+    data = admin.get("/api/bootstrap?limit=2").get_json()
+    assert data["me"]["authenticated"] and data["me"]["is_admin"]
+    assert data["admin"]["name"] == "Admin"
+    assert [p["title"] for p in data["feed"]["posts"]] == ["Post 2", "Post 1"]
+    assert data["feed"]["next_cursor"]
+
+
+def test_admin_email_is_admin_in_me(client, app, monkeypatch):
+    client.post("/api/register", json={"email": "first@example.com", "name": "First", "password": "pw"})
+    client.post("/api/logout")
+    monkeypatch.setattr(main, "ADMIN_EMAIL", "boss@example.com")
+    client.post("/api/register", json={"email": "boss@example.com", "name": "Boss", "password": "pw"})
+    assert client.get("/api/me").get_json()["is_admin"] is True
+    assert client.get("/api/bootstrap").get_json()["me"]["is_admin"] is True
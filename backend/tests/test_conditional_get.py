@@ -0,0 +1,95 @@
+import sqlite3
+
+from conftest import make_posts
+
+import main
+
+
+def db_path() -> str:
+    return main.app.config["SQLALCHEMY_DATABASE_URI"][len("sqlite:///"):]
+
+
+def test_post_etag_and_304(admin, app):
+    (pid,) = make_posts(admin, 1)
+    first = admin.get(f"/api/posts/{pid}")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag
+    assert "no-cache" in first.headers["Cache-Control"]
+
+    again = admin.get(f"/api/posts/{pid}", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.get_data() == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_post_etag_moves_with_comments(admin, app):
+    (pid,) = make_posts(admin, 1)
+    etag = admin.get(f"/api/posts/{pid}").headers["ETag"]
+    assert admin.post(f"/api/posts/{pid}/comments", json={"text": "hi"}).status_code == 201
+
+    resp = admin.get(f"/api/posts/{pid}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert [c["text"] for c in resp.get_json()["comments"]] == ["hi"]
+
+
+def test_feed_etag_moves_on_delete(admin, app):
+    ids = make_posts(admin, 3)
+    etag = admin.get("/api/posts").headers["ETag"]
+    assert admin.get("/api/posts", headers={"If-None-Match": etag}).status_code == 304
+
+    # not the newest post, so neither max(id) nor max(updated_at) would move
+    assert admin.delete(f"/api/posts/{ids[0]}").status_code == 200
+    resp = admin.get("/api/posts", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert [p["id"] for p in resp.get_json()] == [ids[2], ids[1]]
+
+
+def test_write_from_another_worker_is_not_served_stale(admin, app):
+    (pid,) = make_posts(admin, 1)
+    old = admin.get(f"/api/posts/{pid}")  # now in this worker's response cache
+    assert old.get_json()["title"] == "Post 0"
+
+    # another worker's write: same database, but this worker's cache is never told
+    conn = sqlite3.connect(db_path())
+    with conn:
+        conn.execute("UPDATE blog_posts SET title = 'Renamed', version = version + 1 WHERE id = ?", (pid,))
+    conn.close()
+
+    resp = admin.get(f"/api/posts/{pid}")
+    assert resp.headers["ETag"] != old.headers["ETag"]
+    assert resp.get_json()["title"] == "Renamed"
+    assert admin.get(f"/api/posts/{pid}", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
+
+
+def test_feed_write_from_another_worker_is_not_served_stale(admin, app):
+    make_posts(admin, 2)
+    old = admin.get("/api/posts")
+
+    conn = sqlite3.connect(db_path())
+    with conn:
+        conn.execute("UPDATE feed_entries SET title = 'Renamed' WHERE id = (SELECT MAX(id) FROM feed_entries)")
+        conn.execute("UPDATE feed_version SET version = version + 1")
+    conn.close()
+
+    resp = admin.get("/api/posts")
+    assert resp.headers["ETag"] != old.headers["ETag"]
+    assert resp.get_json()[0]["title"] == "Renamed"
+
+
+def test_missing_post_is_404_before_the_view(client, app):
+    assert client.get("/api/posts/999").status_code == 404
+
+
+def test_bootstrap_feed_write_from_another_worker_is_not_served_stale(admin, app):
+    make_posts(admin, 2)
+    old = admin.get("/api/bootstrap").get_json()["feed"]["posts"]
+    assert old[0]["title"] == "Post 1"
+
+    conn = sqlite3.connect(db_path())
+    with conn:
+        conn.execute("UPDATE feed_entries SET title = 'Renamed' WHERE id = (SELECT MAX(id) FROM feed_entries)")
+        conn.execute("UPDATE feed_version SET version = version + 1")
+    conn.close()
+
+    assert admin.get("/api/bootstrap").get_json()["feed"]["posts"][0]["title"] == "Renamed"
@@ -0,0 +1,102 @@
+import pytest
+
+from content import EXCERPT_CHARS, WORDS_PER_MINUTE, render_body, sanitize_html
+
+
+def test_allowed_markup_is_kept():
+    assert sanitize_html("<p>Hi <strong>there</strong></p>") == "<p>Hi <strong>there</strong></p>"
+    assert sanitize_html('<img src="https://x/a.png" alt="a">') == '<img src="https://x/a.png" alt="a">'
+
+
+@pytest.mark.parametrize("raw", [
+    "<p>a</p><script>alert(1)</script><p>b</p>",
+    "<p>a</p><SCRIPT type='text/javascript'>alert(1)</SCRIPT><p>b</p>",
+    "<p>a</p><style>p { color: red }</style><p>b</p>",
+    "<p>a</p><script><p>nested</p></script><p>b</p>",
+])
+def test_script_and_style_are_dropped_with_their_content(raw):
+    assert sanitize_html(raw) == "<p>a</p><p>b</p>"
+
+
+def test_unknown_tags_are_unwrapped():
+    assert sanitize_html("<p><font color=red>hi</font></p>") == "<p>hi</p>"
+
+
+@pytest.mark.parametrize("url", [
+    "javascript:alert(1)",
+    "JaVaScRiPt:alert(1)",
+    "&#106;avascript:alert(1)",
+    "&#x6A;avascript:alert(1)",
+    "javascript&colon;alert(1)",
+    "  javascript:alert(1)",
+    "\x01javascript:alert(1)",
+    "&#1;javascript:alert(1)",
+    "\x00javascript:alert(1)",
+    "java\tscript:alert(1)",
+    "java&#x09;script:alert(1)",
+    "java\nscript:alert(1)",
+    "vbscript:msgbox(1)",
+    "data:text/html;base64,PHNjcmlwdD5hbGVydCgxKTwvc2NyaXB0Pg==",
+    " data:image/svg+xml,<svg onload=alert(1)>",
+])
+def test_dangerous_urls_are_dropped(url):
+    out = sanitize_html(f'<a href="{url}">x</a><img src="{url}">')
+    assert out == '<a rel="nofollow noopener noreferrer">x</a><img>'
+
+
+@pytest.mark.parametrize("url", ["https://example.com/a?b=1&c=2", "http://x", "/relative", "#frag", "mailto:a@b.c"])
+def test_safe_urls_are_kept(url):
+    out = sanitize_html(f'<a href="{url}">x</a>')
+    assert out.startswith('<a href="') and 'rel="nofollow noopener noreferrer"' in out
+    assert "javascript" not in out.lower()
+
+
+@pytest.mark.parametrize("raw", [
+    '<img src="x" onerror="alert(1)">',
+    '<p onclick="alert(1)">hi</p>',
+    '<a href="/" onmouseover="alert(1)" style="x">hi</a>',
+    '<p ONCLICK=alert(1)>hi</p>',
+])
+def test_event_handlers_and_unlisted_attributes_are_dropped(raw):
+    out = sanitize_html(raw).lower()
+    assert "on" not in out.replace("noopener", "").replace("nofollow", "")
+    assert "alert" not in out and "style" not in out
+
+
+def test_attribute_values_are_escaped():
+    assert sanitize_html('<a title="&quot;><script>x</script>" href="/">a</a>') == (
+        '<a title="&quot;&gt;&lt;script&gt;x&lt;/script&gt;" href="/" rel="nofollow noopener noreferrer">a</a>'
+    )
+
+
+def test_text_is_escaped():
+    assert sanitize_html("1 &lt; 2 &amp; <b>3 > 2</b>") == "1 &lt; 2 &amp; <b>3 &gt; 2</b>"
+
+
+def test_unclosed_tags_are_closed():
+    assert sanitize_html("<p><b>bold <i>both") == "<p><b>bold <i>both</i></b></p>"
+
+
+def test_stray_and_misnested_end_tags():
+    assert sanitize_html("</div>text</b></p>") == "text"
+    assert sanitize_html("<p><b>x</p>y</b>") == "<p><b>x</b></p>y"
+    assert sanitize_html("</script><p>still here</p>") == "<p>still here</p>"
+
+
+def test_empty_input():
+    assert sanitize_html(None) == "" and sanitize_html("") == ""
+
+
+def test_render_body_excerpt_and_reading_time():
+    words = " ".join(["word"] * (WORDS_PER_MINUTE * 2 + 1))
+    out = render_body(f"<p>{words}</p><script>var secret = 1;</script>")
+    assert out["body_html"] == f"<p>{words}</p>"
+    assert out["reading_minutes"] == 3
+    assert out["excerpt"].endswith("…") and len(out["excerpt"]) <= EXCERPT_CHARS + 1
+    assert "<" not in out["excerpt"] and "secret" not in out["excerpt"]
+
+
+def test_render_body_short_post():
+    out = render_body("<h2>Title</h2><p>Short &amp; sweet.</p>")
+    assert out["excerpt"].split() == ["Title", "Short", "&", "sweet."]
+    assert out["reading_minutes"] == 1
@@ -0,0 +1,29 @@
+import threading
+
+import pytest
+
+import main
+from passwords import HasherBusy, PasswordHasher
+
+
+def slow_check(stored, password):
+    threading.Event().wait(1)
+    return True
+
+
+def test_timeout_raises_busy(monkeypatch):
+    hasher = PasswordHasher("pbkdf2:sha256:1000", workers=1, timeout=0.05)
+    monkeypatch.setattr("passwords.check_password_hash", slow_check)
+    with pytest.raises(HasherBusy):
+        hasher.verify("pbkdf2:sha256:1000$salt$hash", "pw")
+    hasher.shutdown()
+
+
+def test_slow_login_is_a_503_not_a_500(client, monkeypatch):
+    client.post("/api/register", json={"email": "a@example.com", "name": "A", "password": "pw"})
+    client.post("/api/logout")
+    monkeypatch.setattr(main.hasher, "timeout", 0.05)
+    monkeypatch.setattr("passwords.check_password_hash", slow_check)
+    resp = client.post("/api/login", json={"email": "a@example.com", "password": "pw"})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"]
@@ -0,0 +1,71 @@
+from conftest import count_queries, make_comments, make_posts, make_users
+
+import main
+
+
+def test_feed_page_query_count_is_constant(admin, app):
+    make_posts(admin, 3)
+    main.response_cache.clear()
+    with count_queries() as small:
+        assert admin.get("/api/posts?limit=20").status_code == 200
+
+    make_posts(admin, 30, start=3)
+    main.response_cache.clear()
+    with count_queries() as large:
+        assert admin.get("/api/posts?limit=20").status_code == 200
+
+    assert len(large) == len(small)
+    # feed stamp + one page from feed_entries (a logged-in client adds nothing: identities are cached)
+    assert len(large) <= 2, large
+
+
+def test_legacy_feed_query_count_is_constant(admin, app):
+    make_posts(admin, 25)
+    main.response_cache.clear()
+    with count_queries() as statements:
+        resp = admin.get("/api/posts")
+    assert len(resp.get_json()) == 25
+    assert len(statements) <= 2, statements
+
+
+def test_post_detail_query_count_ignores_comment_authors(admin, app):
+    (pid,) = make_posts(admin, 1)
+    make_comments(app, pid, make_users(app, 2))
+    with count_queries() as few:
+        assert len(admin.get(f"/api/posts/{pid}").get_json()["comments"]) == 2
+
+    make_comments(app, pid, make_users(app, 18, start=2))
+    with count_queries() as many:
+        assert len(admin.get(f"/api/posts/{pid}").get_json()["comments"]) == 20
+
+    assert len(many) == len(few)
+    # post stamp + post row + comments joined to their authors
+    assert len(many) <= 3, many
+
+
+def test_feed_stamp_does_not_scan_posts(admin, app):
+    make_posts(admin, 3)
+    etag = admin.get("/api/posts").headers["ETag"]
+    with count_queries() as statements:
+        assert admin.get("/api/posts", headers={"If-None-Match": etag}).status_code == 304
+    assert len(statements) == 1
+    assert "count(" not in statements[0].lower()
+
+
+def test_keyset_pages_cover_the_feed_once_pinned_first(admin, app):
+    ids = make_posts(admin, 7)
+    assert admin.patch(f"/api/posts/{ids[2]}/pin", json={"pinned": True}).status_code == 200
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/posts?limit=3" + (f"&cursor={cursor}" if cursor else "")
+        page = admin.get(url).get_json()
+        seen.extend(p["id"] for p in page["posts"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [ids[2]] + [i for i in reversed(ids) if i != ids[2]]
+
+
+def test_bad_cursor_is_rejected(client, app):
+    assert client.get("/api/posts?limit=3&cursor=nope").status_code == 400
@@ -0,0 +1,40 @@
+from conftest import count_queries, make_posts
+
+import main
+
+
+def test_repeat_reads_are_served_from_the_cache(admin, app):
+    (pid,) = make_posts(admin, 1)
+    admin.get(f"/api/posts/{pid}")
+    with count_queries() as statements:
+        assert admin.get(f"/api/posts/{pid}").status_code == 200
+    assert len(statements) == 1  # just the ETag stamp
+    assert main.response_cache.stats.as_dict()["hits"] >= 1
+
+
+def test_new_post_invalidates_the_feed(admin, app):
+    make_posts(admin, 1)
+    assert len(admin.get("/api/posts").get_json()) == 1
+    make_posts(admin, 1, start=1)
+    assert [p["title"] for p in admin.get("/api/posts").get_json()] == ["Post 1", "Post 0"]
+
+
+def test_comment_writes_invalidate_post_and_feed(admin, app):
+    (pid,) = make_posts(admin, 1)
+    assert admin.get(f"/api/posts/{pid}").get_json()["comments"] == []
+    assert admin.get("/api/posts").get_json()[0]["comment_count"] == 0
+
+    cid = admin.post(f"/api/posts/{pid}/comments", json={"text": "first"}).get_json()["id"]
+    assert [c["id"] for c in admin.get(f"/api/posts/{pid}").get_json()["comments"]] == [cid]
+    assert admin.get("/api/posts").get_json()[0]["comment_count"] == 1
+
+    assert admin.delete(f"/api/comments/{cid}").status_code == 200
+    assert admin.get(f"/api/posts/{pid}").get_json()["comments"] == []
+    assert admin.get("/api/posts").get_json()[0]["comment_count"] == 0
+
+
+def test_pin_reorders_the_cached_feed(admin, app):
+    ids = make_posts(admin, 2)
+    assert [p["id"] for p in admin.get("/api/posts").get_json()] == [ids[1], ids[0]]
+    admin.patch(f"/api/posts/{ids[0]}/pin", json={"pinned": True})
+    assert [p["id"] for p in admin.get("/api/posts").get_json()] == [ids[0], ids[1]]
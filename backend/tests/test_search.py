@@ -0,0 +1,38 @@
+import main
+
+
+def search(client, q):
+    resp = client.get("/api/search", query_string={"q": q})
+    assert resp.status_code == 200, resp.get_json()
+    return resp.get_json()["results"]
+
+
+def test_post_documents_index_the_sanitized_body(admin):
+    resp = admin.post("/api/posts", json={
+        "title": "Indexed", "subtitle": "sub", "img_url": "http://img",
+        "body": "<p>visible words</p><script>var hiddenpayload = 1;</script>",
+    })
+    assert resp.status_code == 200, resp.get_json()
+    main.index_post_job({"id": resp.get_json()["id"]})
+
+    assert [h["post_title"] for h in search(admin, "visible")] == ["Indexed"]
+    assert search(admin, "hiddenpayload") == []
+
+
+def test_backfill_reindexes_rows_without_stored_html(admin, app):
+    resp = admin.post("/api/posts", json={
+        "title": "Old", "subtitle": "sub", "img_url": "http://img",
+        "body": "<p>legacy text</p>",
+    })
+    pid = resp.get_json()["id"]
+    with app.app_context():
+        # a row from before body_html existed, indexed from its raw HTML
+        main.db.session.execute(main.db.update(main.BlogPost).where(main.BlogPost.id == pid).values(
+            body="<p>legacy text</p><style>.stalestyle {}</style>", body_html=None))
+        main.search.index_posts(main.db.session, [main.SimpleNamespace(
+            id=pid, title="Old", subtitle="sub", body_html="<p>legacy text stalestyle</p>")])
+        main.db.session.commit()
+        assert main.backfill_content() == (1, 0)
+
+    assert [h["post_title"] for h in search(admin, "legacy")] == ["Old"]
+    assert search(admin, "stalestyle") == []
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from local_sqlite import LocalConnection
+
+log = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Write-behind queue
+# -----------------------------
+# Request handlers append validated rows to a local SQLite file and return
+# right away. A background thread drains the file into the real database
+# in batched transactions. Every worker on a host shares the file. A worker
+# claims a batch before flushing it, and claims older than CLAIM_TIMEOUT
+# are taken over, so rows left by a crashed worker still get written
+# (at-least-once).
+
+class QueueFull(Exception):
+    """Raised by put() when the backlog is at max_depth; callers answer 503."""
+
+
+class WriteBehindQueue:
+    CLAIM_TIMEOUT = 60.0
+
+    def __init__(self, path: str, flush_fn, batch_size: int = 200,
+                 interval: float = 0.5, max_depth: int = 10000):
+        """
+        flush_fn(kind, payloads) writes one batch of the given kind to the
+        database and must raise if the write did not commit.
+        """
+        self.path = path
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_depth = max_depth
+        self._conn = LocalConnection(self.path, timeout=10, durable=True)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._owner = f"{os.getpid()}-{id(self)}"
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.flush_count = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.last_flush_seconds = 0.0
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS pending_writes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                claimed_by TEXT,
+                claimed_at REAL);
+            CREATE INDEX IF NOT EXISTS ix_pending_writes_claimed ON pending_writes (claimed_at, id);
+        """)
+
+    # -- producer side --
+    def put(self, kind: str, payload: dict):
+        depth = self.depth()
+        if depth >= self.max_depth:
+            raise QueueFull()
+        self._conn().execute(
+            "INSERT INTO pending_writes (kind, payload, enqueued_at) VALUES (?, ?, ?)",
+            (kind, json.dumps(payload), time.time()),
+        )
+        if depth + 1 >= self.batch_size:
+            self._wake.set()
+
+    def depth(self) -> int:
+        (n,) = self._conn().execute("SELECT COUNT(*) FROM pending_writes").fetchone()
+        return n
+
+    # -- consumer side --
+    def _claim(self) -> list[tuple[int, str, str]]:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE pending_writes SET claimed_by = ?, claimed_at = ? WHERE id IN ("
+                " SELECT id FROM pending_writes WHERE claimed_at IS NULL OR claimed_at < ?"
+                " ORDER BY id LIMIT ?)",
+                (self._owner, now, now - self.CLAIM_TIMEOUT, self.batch_size),
+            )
+            rows = conn.execute(
+                "SELECT id, kind, payload FROM pending_writes WHERE claimed_by = ? AND claimed_at = ? ORDER BY id",
+                (self._owner, now),
+            ).fetchall()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def flush_once(self) -> int:
+        """Write one claimed batch; returns how many rows reached the database."""
+        rows = self._claim()
+        if not rows:
+            return 0
+        t0 = time.perf_counter()
+        by_kind: dict[str, list[tuple[int, dict]]] = {}
+        for row_id, kind, payload in rows:
+            by_kind.setdefault(kind, []).append((row_id, json.loads(payload)))
+        done: list[int] = []
+        for kind, items in by_kind.items():
+            try:
+                self.flush_fn(kind, [p for _, p in items])
+            except Exception:
+                self.failed_flushes += 1
+                log.exception("write-behind flush of %d %s rows failed; will retry", len(items), kind)
+                # release the claim so the batch is retried on the next tick
+                self._conn().executemany(
+                    "UPDATE pending_writes SET claimed_by = NULL, claimed_at = NULL WHERE id = ?",
+                    [(i,) for i, _ in items],
+                )
+                continue
+            done.extend(i for i, _ in items)
+        if done:
+            self._conn().executemany("DELETE FROM pending_writes WHERE id = ?", [(i,) for i in done])
+        elapsed = time.perf_counter() - t0
+        self.flushed += len(done)
+        self.flush_count += 1
+        self.flush_seconds_total += elapsed
+        self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+        self.last_flush_seconds = elapsed
+        return len(done)
+
+    def drain(self, max_rounds: int = 1000):
+        for _ in range(max_rounds):
+            if not self.flush_once():
+                return
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                while self.flush_once() == self.batch_size and not self._stop.is_set():
+                    pass
+            except Exception:
+                log.exception("write-behind worker error")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self, drain: bool = True):
+        """Stop the worker; by default flush whatever this host still has queued."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if drain:
+            self.drain()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "flushed": self.flushed,
+            "failed_flushes": self.failed_flushes,
+            "flushes": self.flush_count,
+            "flush_seconds_last": round(self.last_flush_seconds, 6),
+            "flush_seconds_max": round(self.flush_seconds_max, 6),
+            "flush_seconds_avg": round(self.flush_seconds_total / self.flush_count, 6) if self.flush_count else 0.0,
+        }
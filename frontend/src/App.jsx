@@ -1,5 +1,4 @@
 import { BrowserRouter, Routes, Route, useLocation } from 'react-router-dom'
-import { useEffect } from 'react'
 import Home from './pages/Home.jsx'
 import Post from './pages/Post.jsx'
 import Login from './pages/Login.jsx'
@@ -10,7 +9,6 @@ import Footer from './ui/Footer.jsx'
 import About from "./pages/About.jsx";
 import Contact from "./pages/Contact.jsx";
 import ThreeBG from './ui/ThreeBG.jsx'
-import { fetchCsrf } from './lib/api.js'
 
 import "bootstrap/dist/css/bootstrap.min.css"
 import "./index.css"
@@ -34,8 +32,6 @@ function BackgroundWrapper({ children }) {
 }
 
 export default function App() {
-  useEffect(() => { fetchCsrf() }, []);
-
   return (
     <BrowserRouter>
       <Navbar />
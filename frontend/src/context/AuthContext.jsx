@@ -1,20 +1,37 @@
 import { createContext, useContext, useEffect, useMemo, useState } from "react";
 import api, { fetchCsrf, fetchMe, onAuthChange, notifyAuthChanged } from "../lib/api.js";
 
-const AuthContext = createContext({ me: null });
+const AuthContext = createContext({ me: null, boot: null });
+
+// One round trip on startup: CSRF cookie, current user, admin info and the
+// first feed page (replaces /csrf-token + /me + /admin + /posts).
+async function fetchBootstrap() {
+  const res = await fetch("/api/bootstrap", { credentials: "include" });
+  if (!res.ok) throw new Error(`bootstrap failed: ${res.status}`);
+  return res.json();
+}
 
 export function AuthProvider({ children }) {
   const [me, setMe] = useState(null);
+  const [boot, setBoot] = useState(null); // { admin, feed: { posts, next_cursor } } from the first load
 
   useEffect(() => {
     let mounted = true;
 
     (async () => {
-      try { await fetchCsrf(); } catch {}
       try {
-        const data = await fetchMe();
-        if (mounted) setMe(data);
-      } catch {}
+        const data = await fetchBootstrap();
+        if (mounted) { setMe(data.me); setBoot({ admin: data.admin, feed: data.feed }); }
+      } catch {
+        // older backend: fall back to the separate calls
+        try { await fetchCsrf(); } catch {}
+        try {
+          const data = await fetchMe();
+          if (mounted) setMe(data);
+        } catch {}
+        // no bootstrap data: Home and friends fetch their own
+        if (mounted) setBoot({ admin: null, feed: null });
+      }
     })();
 
     const off = onAuthChange(async () => {
@@ -39,7 +56,7 @@ export function AuthProvider({ children }) {
     setMe({ authenticated: false });
   };
 
-  const value = useMemo(() => ({ me, setMe, refreshMe, logout }), [me]);
+  const value = useMemo(() => ({ me, setMe, boot, refreshMe, logout }), [me, boot]);
   return <AuthContext.Provider value={value}>{children}</AuthContext.Provider>;
 }
 
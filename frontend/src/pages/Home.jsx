@@ -3,10 +3,13 @@ import { Link, useNavigate } from "react-router-dom";
 import api, { fetchAdminInfo } from "../lib/api.js";
 import { useAuth } from "../context/AuthContext.jsx";
 
+// the bootstrap feed page is only fresh for the first render after page load
+let bootFeedUsed = false;
+
 export default function Home() {
   const [posts, setPosts] = useState([]);
   const [admin, setAdmin] = useState(null);
-  const { me } = useAuth();
+  const { me, boot } = useAuth();
   const navigate = useNavigate();
 
   async function loadPosts() {
@@ -14,15 +17,25 @@ export default function Home() {
     setPosts(data);
   }
 
-  // Load posts once
-  useEffect(() => { loadPosts(); }, []);
+  // Load posts once, from /api/bootstrap when it has them (see AuthContext)
+  useEffect(() => {
+    if (!boot) return; // bootstrap still in flight
+    if (boot.feed && !bootFeedUsed) {
+      bootFeedUsed = true;
+      setPosts(boot.feed.posts);
+      if (boot.feed.next_cursor) loadPosts(); // more than one page: fetch the full list
+    } else {
+      loadPosts();
+    }
+  }, [boot]);
 
-  // Fetch admin contact (with env fallback) once
+  // Admin contact (with env fallback) once, from the bootstrap payload when present
   useEffect(() => {
+    if (!boot) return;
     let alive = true;
     (async () => {
       try {
-        const info = await fetchAdminInfo();
+        const info = boot.admin ?? await fetchAdminInfo();
         const fallback = {
           name: import.meta.env.VITE_ADMIN_NAME,
           email: import.meta.env.VITE_ADMIN_EMAIL,
@@ -37,7 +50,7 @@ export default function Home() {
       }
     })();
     return () => { alive = false; };
-  }, []);
+  }, [boot]);
 
   async function togglePin(id) {
     await api.patch(`/posts/${id}/pin`,{});
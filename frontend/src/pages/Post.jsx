@@ -1,6 +1,7 @@
 import { useEffect, useState } from "react";
 import { useParams, useNavigate } from "react-router-dom";
-import api, { fetchCsrf, fetchMe } from "../lib/api.js";
+import api from "../lib/api.js";
+import { useAuth } from "../context/AuthContext.jsx";
 import PageWrapper from "../ui/PageWrapper.jsx";
 
 export default function Post() {
@@ -9,11 +10,9 @@ export default function Post() {
   const [post, setPost] = useState(null);
   const [text, setText] = useState("");
   const [error, setError] = useState("");
-  const [me, setMe] = useState(null);
+  const { me } = useAuth(); // CSRF cookie and user already loaded by AuthProvider
 
   async function load() {
-    await fetchCsrf();
-    setMe(await fetchMe());
     const { data } = await api.get(`/posts/${id}`);
     setPost(data);
   }
@@ -1,28 +1,14 @@
-import { useEffect, useState } from "react";
+import { useState } from "react";
 import { Link, useLocation, useNavigate } from "react-router-dom";
 import { useAuth } from "../context/AuthContext.jsx";
-import api, { fetchCsrf, fetchMe, onAuthChange, notifyAuthChanged } from "../lib/api.js";
+import api, { notifyAuthChanged } from "../lib/api.js";
 
 export default function Navbar() {
-  const {me, setMe, logout} = useAuth();
+  // AuthProvider loads `me` (via /api/bootstrap) and refreshes it on auth changes
+  const {me, logout} = useAuth();
   const location = useLocation();
   const navigate = useNavigate();
 
-  useEffect(() => {
-    let mounted = true;
-    (async () => {
-      await fetchCsrf();           // ensure CSRF cookie exists
-      const data = await fetchMe(); // { authenticated, name, email, is_admin }
-      if (mounted) setMe(data);
-    })();
-
-    const off = onAuthChange(async () => {
-      const data = await fetchMe();
-      setMe(data);
-    });
-    return () => { mounted = false; off();};
-  }, [setMe]);
-
   const linkCls = (path) =>
     "nav-link navLink" + (location.pathname === path ? " active" : "");
 